@@ -0,0 +1,41 @@
+"""
+hyper.sh API client.
+
+The public names below are imported on first access, so `import
+hypersh_client` doesn't pay for requests, aiohttp or the signer until a
+client is actually used.
+"""
+
+import importlib
+
+
+_LAZY_ATTRIBUTES = {
+    'HypershClient': '.main.hypersh',
+    'AsyncHypershClient': '.main.async_hypersh',
+    'MultiRegionClient': '.main.multiregion',
+    'Container': '.main.containers',
+    'ContainerSet': '.main.containers',
+    'Inventory': '.main.inventory',
+    'ClockSkew': '.main.clockskew',
+    'Credentials': '.main.credentials',
+    'CredentialChain': '.main.credentials',
+    'NoCredentialsError': '.main.credentials',
+    'default_credentials': '.main.credentials',
+    'AWS4Auth': '.aws4auth2.aws4auth_hypersh',
+    'FastAWS4Auth': '.aws4auth2.fast_aws4auth',
+}
+
+__all__ = sorted(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from hypersh_client.conftest import StandInHandler
+from hypersh_client.main.async_hypersh import AsyncHypershClient
+from hypersh_client.main.containers import Container, ContainerSet
+
+
+CONTAINERS = [
+    {'Id': 'c1', 'Names': ['/node-1'], 'State': 'running', 'Image': 'digiology/selenium_node'},
+    {'Id': 'c2', 'Names': ['/node-2'], 'State': 'exited', 'Image': 'digiology/selenium_node'},
+    {'Id': 'c3', 'Names': ['/hub'], 'State': 'running', 'Image': 'selenium/hub'},
+]
+
+
+class ApiHandler(StandInHandler):
+
+    def _reply(self, status, body=None):
+        self.server.seen.append((self.command, self.path, dict(self.headers)))
+        self.send_json(status, body)
+
+    def do_GET(self):
+        if self.path.startswith('/v1.23/containers/json'):
+            return self._reply(200, CONTAINERS)
+        if self.path == '/v1.23/fips':
+            return self._reply(200, [{'fip': '1.2.3.4'}])
+        self._reply(404, {'message': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'null')
+        if self.path.startswith('/v1.23/containers/create'):
+            return self._reply(201, {'Id': 'new-' + body['Hostname']})
+        if self.path.endswith('/start'):
+            return self._reply(204)
+        if self.path.startswith('/v1.23/fips/attach'):
+            return self._reply(200)
+        self._reply(404, {'message': 'not found'})
+
+    def do_DELETE(self):
+        self._reply(200 if self.path.split('?')[0].split('/')[-1] != 'missing' else 404)
+
+
+@pytest.fixture
+def stand_in(stand_in_server):
+    return stand_in_server(ApiHandler, seen=[])
+
+
+def _client(server):
+    client = AsyncHypershClient('us-west-1', access_key='test-access-key', secret='test-secret')
+    client.hyper_endpoint = server.endpoint
+    return client
+
+
+def test_get_containers_filters_and_signs(stand_in):
+    async def run():
+        async with _client(stand_in) as client:
+            return await client.get_containers(state='running', image='digiology/selenium_node')
+
+    success, containers = asyncio.run(run())
+    assert success
+    assert containers == [{'id': 'c1', 'name': 'node-1', 'state': 'running', 'image': 'digiology/selenium_node'}]
+    _, path, headers = stand_in.seen[0]
+    assert path == (
+        '/v1.23/containers/json?all=1&filters='
+        '%7B%22ancestor%22%3A%5B%22digiology%2Fselenium_node%22%5D%2C%22status%22%3A%5B%22running%22%5D%7D'
+    )
+    assert headers['Authorization'].startswith('HYPER-HMAC-SHA256 Credential=test-access-key/')
+    assert 'x-hyper-date' in {k.lower() for k in headers}
+
+
+def test_get_containers_as_records(stand_in):
+    async def run():
+        async with _client(stand_in) as client:
+            return await client.get_containers(image='digiology/selenium_node', as_records=True)
+
+    success, containers = asyncio.run(run())
+    assert success
+    assert isinstance(containers, ContainerSet)
+    assert sorted(containers.ids()) == ['c1', 'c2']
+    assert containers.get_by_name('node-2') == Container.from_api(CONTAINERS[1])
+    assert [c.id for c in containers.with_state('running')] == ['c1']
+
+
+def test_create_remove_and_fips(stand_in):
+    async def run():
+        async with _client(stand_in) as client:
+            created = await asyncio.gather(*[client.create_container('img', name='n%d' % i) for i in range(20)])
+            removed = await asyncio.gather(client.remove_container('c1'), client.remove_container('missing'))
+            fips = await client.get_fips()
+            attached = await client.attach_fip('c1', '1.2.3.4')
+            return created, removed, fips, attached
+
+    created, removed, fips, attached = asyncio.run(run())
+    assert sorted(created) == sorted((True, 'new-n%d' % i) for i in range(20))
+    assert removed == [True, False]
+    assert fips == (True, ['1.2.3.4'])
+    assert attached is True
@@ -31,7 +31,7 @@ import shlex
 from requests.auth import AuthBase
 from .aws4signingkey import AWS4SigningKey
 from .exceptions import DateFormatError, DateMismatchError, NoSecretKeyError
-from .six import PY2, text_type
+from .compat import PY2, text_type
 
 
 try:
@@ -156,36 +156,30 @@ class AWS4Auth(AuthBase):
 
     Multithreading
     --------------
-    If you share AWS4Auth (or even StrictAWS4Auth) instances between threads
-    you are likely to encounter problems. Because AWS4Auth instances may
-    unpredictably regenerate their signing key as part of signing a request,
-    threads using the same instance may find the key changed by another thread
-    halfway through the signing process, which may result in undefined
-    behaviour.
-
-    It may be possible to rig up a workable instance sharing mechanism using
-    locking primitives and the StrictAWS4Auth class, however this poor author
-    can't think of a scenario which works safely yet doesn't suffer from at
-    some point blocking all threads for at least the duration of an HTTP
-    request, which could be several seconds. If several requests come in in
-    close succession which all require key regenerations then the system could
-    be forced into serial operation for quite a length of time.
-
-    In short, it's best to create a thread-local instance of AWS4Auth for each
-    thread that needs to do authentication.
+    AWS4Auth instances can be shared between threads. The signing key, and
+    with it the region, service and date scope, is an AWS4SigningKey that is
+    never modified once built; regenerating it builds a new key and swaps the
+    instance's reference in one assignment. Each call takes a snapshot of
+    that reference and signs the whole request with it, so a regeneration
+    triggered by another thread can't change the key halfway through. No
+    locks are held while signing.
 
     Class attributes
     ----------------
     AWS4Auth.access_id   -- the access ID supplied to the instance
-    AWS4Auth.region      -- the AWS region for the instance
+    AWS4Auth.region      -- the AWS region for the instance (read from the
+                            current signing key)
     AWS4Auth.service     -- the endpoint code for the service for this instance
-    AWS4Auth.date        -- the date the instance is valid for
+                            (read from the current signing key)
+    AWS4Auth.date        -- the date the instance is valid for (read from the
+                            current signing key)
     AWS4Auth.signing_key -- instance of AWS4SigningKey used for this instance,
                             either generated from the supplied parameters or
                             supplied directly on the command line
 
     """
-    default_include_headers = ['content-type', 'host', 'content-type', 'date', 'x-hyper-*']
+    # a tuple so instances can't append to the shared class default
+    default_include_headers = ('content-type', 'host', 'content-type', 'date', 'x-hyper-*')
 
     def __init__(self, *args, **kwargs):
         """
@@ -231,27 +225,36 @@ class AWS4Auth(AuthBase):
                     -- Must be supplied as keyword argument. If session_token
                        is set, then it is used for the x-amz-security-token
                        header, for use with STS temporary credentials.
+        credentials
+                    -- Must be supplied as keyword argument. A provider whose
+                       get() returns an object with access_id, secret_key and
+                       session_token attributes, returning the same object
+                       until the credentials change. When set, access_id and
+                       secret_key may be None: the signing key is built on
+                       first use and rebuilt whenever get() returns new
+                       credentials, so keys can rotate without replacing the
+                       AWS4Auth instance.
 
         """
         l = len(args)
         if l not in [2, 4, 5]:
             msg = 'AWS4Auth() takes 2, 4 or 5 arguments, {} given'.format(l)
             raise TypeError(msg)
-        self.access_id = args[0]
+        self.credentials = kwargs.get('credentials')
+        # (access_id, signing_key, credentials the key was built from),
+        # replaced as a whole so the id and key always match
+        self._signing_state = (args[0], None, None)
         if isinstance(args[1], AWS4SigningKey) and l == 2:
             # instantiate from signing key
             self.signing_key = args[1]
-            self.region = self.signing_key.region
-            self.service = self.signing_key.service
-            self.date = self.signing_key.date
+            self._scope = (args[1].region, args[1].service, args[1].date)
         elif l in [4, 5]:
             # instantiate from args
             secret_key = args[1]
-            self.region = args[2]
-            self.service = args[3]
-            self.date = args[4] if l == 5 else None
-            self.signing_key = None
-            self.regenerate_signing_key(secret_key=secret_key)
+            self._scope = (args[2], args[3], args[4] if l == 5 else None)
+            if secret_key is not None or self.credentials is None:
+                self.regenerate_signing_key(secret_key=secret_key, region=args[2], service=args[3],
+                                            date=args[4] if l == 5 else None)
         else:
             raise TypeError()
 
@@ -262,11 +265,65 @@ class AWS4Auth(AuthBase):
             raise ValueError('raise_invalid_date must be True or False in AWS4Auth.__init__()')
 
         self.session_token = kwargs.get('session_token')
+        include_hdrs = list(self.default_include_headers)
         if self.session_token:
-            self.default_include_headers.append('x-hyper-security-token')
-        self.include_hdrs = kwargs.get('include_hdrs', self.default_include_headers)
+            include_hdrs.append('x-hyper-security-token')
+        self.include_hdrs = kwargs.get('include_hdrs', include_hdrs)
         AuthBase.__init__(self)
 
+    @property
+    def access_id(self):
+        return self._signing_state[0]
+
+    @access_id.setter
+    def access_id(self, access_id):
+        state = self._signing_state
+        self._signing_state = (access_id, state[1], state[2])
+
+    @property
+    def signing_key(self):
+        return self._signing_state[1]
+
+    @signing_key.setter
+    def signing_key(self, signing_key):
+        state = self._signing_state
+        self._signing_state = (state[0], signing_key, state[2])
+
+    @property
+    def region(self):
+        key = self.signing_key
+        return key.region if key is not None else self._scope[0]
+
+    @property
+    def service(self):
+        key = self.signing_key
+        return key.service if key is not None else self._scope[1]
+
+    @property
+    def date(self):
+        key = self.signing_key
+        return key.date if key is not None else self._scope[2]
+
+    def get_signing_state(self):
+        """
+        Return the (access_id, signing_key, credentials) snapshot to sign a
+        request with. If a credentials provider is set and has new
+        credentials, build a key for them first and publish it.
+
+        """
+        state = self._signing_state
+        if self.credentials is None:
+            return state
+        credentials = self.credentials.get()
+        if state[2] is credentials and state[1] is not None:
+            return state
+        current = state[1]
+        signing_key = AWS4SigningKey(credentials.secret_key, self.region, self.service, self.date,
+                                     current.store_secret_key if current is not None else True)
+        state = (credentials.access_id, signing_key, credentials)
+        self._signing_state = state
+        return state
+
     def regenerate_signing_key(self, secret_key=None, region=None, service=None, date=None):
         """
         Regenerate the signing key for this instance. Store the new key in
@@ -289,25 +346,26 @@ class AWS4Auth(AuthBase):
         generating the new key. If there is no existing key, then default
         to setting store_secret_key to True for new key.
 
+        The new key replaces the old one in a single assignment and is also
+        returned, so callers signing concurrently always see a complete key.
+
         """
-        region = "us-west-1"
-        if secret_key is None and (self.signing_key is None or self.signing_key.secret_key is None):
+        access_id, current, credentials = self._signing_state
+        if secret_key is None and (current is None or current.secret_key is None):
             raise NoSecretKeyError
 
-        secret_key = secret_key or self.signing_key.secret_key
+        secret_key = secret_key or current.secret_key
         region = region or self.region
         service = service or self.service
         date = date or self.date
-        if self.signing_key is None:
+        if current is None:
             store_secret_key = True
         else:
-            store_secret_key = self.signing_key.store_secret_key
-
-        self.signing_key = AWS4SigningKey(secret_key, region, service, date, store_secret_key)
+            store_secret_key = current.store_secret_key
 
-        self.region = region
-        self.service = service
-        self.date = self.signing_key.date
+        signing_key = AWS4SigningKey(secret_key, region, service, date, store_secret_key)
+        self._signing_state = (access_id, signing_key, credentials)
+        return signing_key
 
     def __call__(self, req):
         """
@@ -319,7 +377,8 @@ class AWS4Auth(AuthBase):
         contain a Date header.
 
         Check request date matches date in the current signing key. If not,
-        regenerate signing key to match request date.
+        regenerate signing key to match request date. The key is read once
+        and used for the whole request, see Multithreading above.
 
         If request body is not already encoded to bytes, encode to charset
         specified in Content-Type header, or UTF-8 if not specified.
@@ -339,9 +398,10 @@ class AWS4Auth(AuthBase):
             now = datetime.datetime.utcnow()
             req_date = now.date()
             req.headers['x-hyper-date'] = now.strftime('%Y%m%dT%H%M%SZ')
+        access_id, signing_key, credentials = self.get_signing_state()
         req_scope_date = req_date.strftime('%Y%m%d')
-        if req_scope_date != self.date:
-            self.handle_date_mismatch(req)
+        if req_scope_date != signing_key.date:
+            signing_key = self.handle_date_mismatch(req) or signing_key
 
         # encode body and generate body hash
         if hasattr(req, 'body') and req.body is not None:
@@ -350,8 +410,9 @@ class AWS4Auth(AuthBase):
         else:
             content_hash = hashlib.sha256(b'')
         req.headers['x-hyper-content-sha256'] = content_hash.hexdigest()
-        if self.session_token:
-            req.headers['x-hyper-security-token'] = self.session_token
+        session_token = getattr(credentials, 'session_token', None) or self.session_token
+        if session_token:
+            req.headers['x-hyper-security-token'] = session_token
 
         # force required headers
         if 'Content-Type' not in req.headers:
@@ -363,12 +424,12 @@ class AWS4Auth(AuthBase):
         result = self.get_canonical_headers(req, self.include_hdrs)
         cano_headers, signed_headers = result
         cano_req = self.get_canonical_request(req, cano_headers, signed_headers)
-        sig_string = self.get_sig_string(req, cano_req, self.signing_key.scope)
+        sig_string = self.get_sig_string(req, cano_req, signing_key.scope)
         sig_string = sig_string.encode('utf-8')
-        hsh = hmac.new(self.signing_key.key, sig_string, hashlib.sha256)
+        hsh = hmac.new(signing_key.key, sig_string, hashlib.sha256)
         sig = hsh.hexdigest()
         auth_str = 'HYPER-HMAC-SHA256 '
-        auth_str += 'Credential={}/{}, '.format(self.access_id, self.signing_key.scope)
+        auth_str += 'Credential={}/{}, '.format(access_id, signing_key.scope)
         auth_str += 'SignedHeaders={}, '.format(signed_headers)
         auth_str += 'Signature={}'.format(sig)
         req.headers['Authorization'] = auth_str
@@ -465,15 +526,16 @@ class AWS4Auth(AuthBase):
         """
         Handle a request whose date doesn't match the signing key scope date.
 
-        This AWS4Auth class implementation regenerates the signing key. See
-        StrictAWS4Auth class if you would prefer an exception to be raised.
+        This AWS4Auth class implementation regenerates the signing key and
+        returns it. See StrictAWS4Auth class if you would prefer an exception
+        to be raised. Return None to sign with the current key.
 
         req -- a requests prepared request object
 
         """
         req_datetime = self.get_request_date(req)
         new_key_date = req_datetime.strftime('%Y%m%d')
-        self.regenerate_signing_key(date=new_key_date)
+        return self.regenerate_signing_key(date=new_key_date)
 
     @staticmethod
     def encode_body(req):
@@ -15,7 +15,7 @@ import hashlib
 from warnings import warn
 from datetime import datetime
 
-from .six import text_type
+from .compat import text_type
 
 
 class AWS4SigningKey:
@@ -0,0 +1,17 @@
+"""
+The two names this package used from six. Importing the full six module
+cost more than the rest of the package, so it is no longer vendored.
+
+"""
+
+# Licensed under the MIT License:
+# http://opensource.org/licenses/MIT
+
+import sys
+
+PY2 = sys.version_info[0] == 2
+
+if PY2:
+    text_type = unicode  # noqa: F821
+else:
+    text_type = str
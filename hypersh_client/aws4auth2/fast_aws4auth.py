@@ -0,0 +1,483 @@
+"""
+Provides FastAWS4Auth, a drop-in AWS4Auth that signs the same requests with
+byte-identical headers in a fraction of the time.
+
+"""
+
+# Licensed under the MIT License:
+# http://opensource.org/licenses/MIT
+
+from __future__ import unicode_literals
+
+import datetime
+import hashlib
+import hmac
+import re
+import string
+
+from .aws4auth_hypersh import AWS4Auth
+from .exceptions import DateFormatError
+from .hyperdate import HyperDate, hyper_dates
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+
+# x-hyper-date format, the same pattern AWS4Auth.parse_date tries. None of
+# the formats it tries before this one can match a string with no spaces, so
+# checking it first gives the same answer.
+_AMZ_DATE = re.compile(r'^(\d{4})(\d{2})(\d{2})T\d{6}Z$')
+
+# shlex.split(posix=False) only treats these as whitespace, and only quotes
+# change how a value is tokenised
+_SHLEX_WHITESPACE = re.compile('[ \t\r\n]+')
+
+# paths and querystrings that every canonicalisation step leaves untouched:
+# nothing to quote, unquote, collapse or resolve
+_UNRESERVED = '[A-Za-z0-9_.~-]'
+_PLAIN_PATH = re.compile(r'{0}+(?:/{0}+)*/?\Z'.format(_UNRESERVED))
+_DOT_SEGMENT = re.compile(r'(?:^|/)\.\.?(?:/|\Z)')
+_PLAIN_QUERY = re.compile(r'{0}+={0}*(?:&{0}+={0}*)*\Z'.format(_UNRESERVED))
+
+MEMO_SIZE = 4096
+
+_EMPTY_SHA256 = hashlib.sha256(b'').hexdigest()
+
+# Parsed dates and compiled include lists, by the header value or include
+# list they came from. Module level because get_request_date and
+# get_canonical_headers are classmethods, as on AWS4Auth, with no instance
+# to keep them on; sharing them is safe, each entry depends only on its key.
+_date_memo = {}
+_include_memo = {}
+
+
+def _remember(memo, key, value):
+    # crude bound: start over once full. Hot routes are back in a few calls.
+    if len(memo) >= MEMO_SIZE:
+        memo.clear()
+    memo[key] = value
+    return value
+
+
+class FastAWS4Auth(AWS4Auth):
+    """
+    AWS4Auth with the per-request overhead taken out. Everything it signs
+    gets exactly the headers AWS4Auth would have produced, errors included;
+    fast_aws4auth_test fuzzes the two against each other.
+
+    Where the time went, and what this does instead:
+
+        * Header values went through shlex.split. Values without quotes
+          (nearly all of them) are tokenised with one regex instead, which
+          is what shlex does to them.
+        * parse_date built its format table and compiled its regexes per
+          call, and strptime ran per request. x-hyper-date values are
+          matched with one precompiled regex and the parsed date is
+          remembered per day.
+        * The URL went through urlparse, normpath, re.sub, quote, unquote
+          and parse_qs per request. Paths and querystrings made only of
+          unreserved characters canonicalise to themselves and skip all of
+          it; the canonical form of anything else is computed by AWS4Auth
+          and remembered per URL.
+        * The include list was lowercased and the headers copied per call.
+        * The date was formatted by the caller and parsed back here. A
+          HyperDate x-hyper-date (see hyperdate) carries its parsed fields.
+
+    Memos are plain dicts, bounded at MEMO_SIZE entries and safe to share
+    between threads (a lost update only costs a recomputation). The URL and
+    scope date memos belong to the instance.
+
+    """
+
+    # where requests without a usable date get their x-hyper-date
+    hyper_dates = hyper_dates
+    # anything with an offset attribute, in seconds, added to the local
+    # clock when this signer stamps x-hyper-date (see HypershClient)
+    clock_skew = None
+
+    def __init__(self, *args, **kwargs):
+        """Takes the same arguments as AWS4Auth."""
+        AWS4Auth.__init__(self, *args, **kwargs)
+        self._routes = {}
+        self._fixed_routes = {}
+        self._scope_date_memo = {}
+        self._url_memo = {}
+
+    def add_route(self, method, url, headers=None):
+        """
+        Compile a RouteTemplate for requests to url and use it for every
+        matching request signed from now on. See RouteTemplate.
+
+        method  -- HTTP method of the route
+        url     -- full URL, with {name} fields standing for path segments
+                   that change per call, e.g.
+                   'https://us-west-1.hyper.sh/v1.23/containers/{id}/start'
+        headers -- static headers every request on the route carries, e.g.
+                   {'content-type': 'application/json'}
+
+        """
+        route = RouteTemplate(method, url, headers, self._include_rules(self.include_hdrs))
+        if route.pattern is None:
+            self._fixed_routes[(route.method, url)] = route
+        else:
+            self._routes.setdefault(route.method, []).append(route)
+        return route
+
+    def match_route(self, method, url):
+        """Return the RouteTemplate added for method and url, or None."""
+        route = self._fixed_routes.get((method, url))
+        if route is not None:
+            return route
+        for route in self._routes.get(method, ()):
+            match = route.pattern.match(url)
+            if match is not None and '.' not in match.groups() and '..' not in match.groups():
+                return route
+        return None
+
+    def _now(self):
+        clock_skew = self.clock_skew
+        return self.hyper_dates.now(clock_skew.offset if clock_skew is not None else 0.0)
+
+    @classmethod
+    def _include_rules(cls, include):
+        include_key = tuple(include)
+        rules = _include_memo.get(include_key)
+        if rules is None:
+            names = frozenset(x.lower() for x in include)
+            rules = _remember(_include_memo, include_key, (names, '*' in names, 'x-hyper-*' in names))
+        return rules
+
+    def __call__(self, req):
+        """
+        Sign req exactly as AWS4Auth.__call__ does; see there.
+
+        req -- Requests PreparedRequest object
+
+        """
+        stamp = req.headers.get('x-hyper-date')
+        if type(stamp) is not HyperDate:
+            req_date = self.get_request_date(req)
+            if req_date is None:
+                if 'date' in req.headers:
+                    del req.headers['date']
+                if 'x-hyper-date' in req.headers:
+                    del req.headers['x-hyper-date']
+                stamp = req.headers['x-hyper-date'] = self._now()
+        if type(stamp) is HyperDate:
+            scope_date = stamp.scope
+        else:
+            scope_date = self._scope_date_memo.get(req_date)
+            if scope_date is None:
+                scope_date = _remember(self._scope_date_memo, req_date, req_date.strftime('%Y%m%d'))
+        access_id, signing_key, credentials = self.get_signing_state()
+        if scope_date != signing_key.date:
+            signing_key = self.handle_date_mismatch(req) or signing_key
+
+        session_token = getattr(credentials, 'session_token', None) or self.session_token
+        return self._sign(req, access_id, signing_key, session_token, self._include_rules(self.include_hdrs))
+
+    def sign_batch(self, prepared_requests):
+        """
+        Sign many requests in one pass. All of them get the same x-hyper-date
+        (any they had is replaced; a Date header is left alone but no longer
+        decides the signing date), and the date check, key and credentials
+        lookup and include list handling are done once for the whole batch
+        instead of per request. Each request ends up signed exactly as
+        __call__ would sign it with that x-hyper-date.
+
+        Returns prepared_requests. Send them promptly: the server rejects
+        signatures whose date is too far from its clock.
+
+        prepared_requests -- list of Requests PreparedRequest objects
+
+        """
+        if not prepared_requests:
+            return prepared_requests
+        stamp = self._now()
+        for req in prepared_requests:
+            req.headers['x-hyper-date'] = stamp
+        access_id, signing_key, credentials = self.get_signing_state()
+        if stamp.scope != signing_key.date:
+            signing_key = self.handle_date_mismatch(prepared_requests[0]) or signing_key
+        session_token = getattr(credentials, 'session_token', None) or self.session_token
+        include_rules = self._include_rules(self.include_hdrs)
+        # the HMAC keyed once, and the start of the string to sign, are the
+        # same for every request in the batch
+        mac = hmac.new(signing_key.key, digestmod=hashlib.sha256)
+        sig_prefix = '\n'.join(('HYPER-HMAC-SHA256', stamp, signing_key.scope, ''))
+        for req in prepared_requests:
+            self._sign(req, access_id, signing_key, session_token, include_rules, mac, sig_prefix)
+        return prepared_requests
+
+    def _sign(self, req, access_id, signing_key, session_token, include_rules, mac=None, sig_prefix=None):
+        # everything after the date and key are settled, shared by __call__
+        # and sign_batch
+        if getattr(req, 'body', None) is not None:
+            self.encode_body(req)
+            content_hash = hashlib.sha256(req.body).hexdigest()
+        else:
+            content_hash = _EMPTY_SHA256
+        headers = req.headers
+        headers['x-hyper-content-sha256'] = content_hash
+        if session_token:
+            headers['x-hyper-security-token'] = session_token
+
+        method = req.method.upper()
+        route = self.match_route(method, req.url) if self._routes or self._fixed_routes else None
+        host = route.host if route is not None else self._canonical_url(req.url)[2]
+        if 'Content-Type' not in headers:
+            headers['Content-Type'] = 'application/json'
+        if 'host' not in headers:
+            headers['host'] = host
+
+        signed = None
+        if route is not None:
+            signed = route.canonical_request(req, include_rules, content_hash)
+        if signed is None:
+            cano_path, cano_qs, _ = self._canonical_url(req.url)
+            cano_headers, signed_headers = self.get_canonical_headers(req, self.include_hdrs)
+            cano_req = '\n'.join((method, cano_path, cano_qs, cano_headers, signed_headers, content_hash))
+        else:
+            cano_req, signed_headers = signed
+        if sig_prefix is None:
+            sig_prefix = '\n'.join(('HYPER-HMAC-SHA256', headers['x-hyper-date'], signing_key.scope, ''))
+        sig_string = (sig_prefix + hashlib.sha256(cano_req.encode()).hexdigest()).encode('utf-8')
+        if mac is None:
+            sig = hmac.new(signing_key.key, sig_string, hashlib.sha256).hexdigest()
+        else:
+            mac = mac.copy()
+            mac.update(sig_string)
+            sig = mac.hexdigest()
+        headers['Authorization'] = 'HYPER-HMAC-SHA256 Credential={}/{}, SignedHeaders={}, Signature={}'.format(
+            access_id, signing_key.scope, signed_headers, sig)
+        return req
+
+    def _canonical_url(self, url):
+        """Return (canonical path, canonical querystring, host) for url."""
+        key = (url, self.service)
+        parts = self._url_memo.get(key)
+        if parts is None:
+            parsed = urlparse(url)
+            split = url.split('?', 1)
+            parts = _remember(self._url_memo, key, (
+                self.amz_cano_path(parsed.path[1:]),
+                self.amz_cano_querystring(split[1] if len(split) == 2 else ''),
+                parsed.netloc.split(':')[0],
+            ))
+        return parts
+
+    def get_canonical_request(self, req, cano_headers, signed_headers):
+        """
+        Create the AWS authentication Canonical Request string, as
+        AWS4Auth.get_canonical_request does.
+
+        """
+        cano_path, cano_qs, _ = self._canonical_url(req.url)
+        return '\n'.join((req.method.upper(), cano_path, cano_qs, cano_headers, signed_headers,
+                          req.headers['x-hyper-content-sha256']))
+
+    @classmethod
+    def get_request_date(cls, req):
+        """
+        Same result as AWS4Auth.get_request_date, with x-hyper-date values
+        matched against a single precompiled regex.
+
+        """
+        headers = req.headers
+        for header in ('x-hyper-date', 'date'):
+            if header not in headers:
+                continue
+            value = headers[header]
+            if type(value) is HyperDate:
+                return value.date
+            match = _AMZ_DATE.search(value) if isinstance(value, str) else None
+            if match is not None:
+                date_str = '{}-{}-{}'.format(*match.groups())
+            else:
+                try:
+                    date_str = cls.parse_date(value)
+                except DateFormatError:
+                    continue
+            try:
+                date = _date_memo[date_str]
+            except KeyError:
+                try:
+                    date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
+                except ValueError:
+                    date = None
+                _remember(_date_memo, date_str, date)
+            if date is not None:
+                return date
+        return None
+
+    @classmethod
+    def get_canonical_headers(cls, req, include=None):
+        """
+        Same result as AWS4Auth.get_canonical_headers, without copying the
+        headers or re-lowercasing the include list.
+
+        """
+        if include is None:
+            include = cls.default_include_headers
+        names, include_all, include_hyper = cls._include_rules(include)
+
+        cano_headers_dict = {}
+        norm = cls.amz_norm_whitespace
+        for hdr, val in req.headers.items():
+            if not isinstance(hdr, str):
+                return AWS4Auth.get_canonical_headers.__func__(cls, req, include)
+            hdr = hdr.strip().lower()
+            # normalised even if excluded: unbalanced quotes raise either way
+            val = norm(val).strip()
+            if (hdr in names or include_all or (include_hyper and hdr.startswith('x-hyper-') and
+                                                 hdr != 'x-hyper-client-context')):
+                cano_headers_dict.setdefault(hdr, []).append(val)
+        hdrs = sorted(cano_headers_dict)
+        cano_headers = ''.join(
+            '{}:{}\n'.format(hdr, ','.join(sorted(cano_headers_dict[hdr]))) for hdr in hdrs
+        )
+        return cano_headers, ';'.join(hdrs)
+
+    def amz_cano_path(self, path):
+        """Same result as AWS4Auth.amz_cano_path."""
+        if _PLAIN_PATH.match(path) and not _DOT_SEGMENT.search(path):
+            return path
+        return AWS4Auth.amz_cano_path(self, path)
+
+    @staticmethod
+    def amz_cano_querystring(qs):
+        """Same result as AWS4Auth.amz_cano_querystring."""
+        if not qs:
+            return ''
+        if _PLAIN_QUERY.match(qs):
+            return '&'.join(sorted(qs.split('&')))
+        return AWS4Auth.amz_cano_querystring(qs)
+
+    @staticmethod
+    def amz_norm_whitespace(text):
+        """Same result as AWS4Auth.amz_norm_whitespace."""
+        if isinstance(text, bytes):
+            text = text.decode()
+        if isinstance(text, str) and '"' not in text and "'" not in text:
+            return _SHLEX_WHITESPACE.sub(' ', text).strip(' ')
+        return AWS4Auth.amz_norm_whitespace(text)
+
+
+# headers the signer sets per request; everything else a route signs is static
+_DYNAMIC_HEADERS = frozenset(['x-hyper-date', 'x-hyper-content-sha256', 'x-hyper-security-token'])
+
+
+def _is_included(name, rules):
+    names, include_all, include_hyper = rules
+    return (name in names or include_all or (include_hyper and name.startswith('x-hyper-') and
+                                             name != 'x-hyper-client-context'))
+
+
+class RouteTemplate(object):
+    """
+    The part of signing a route that is the same on every call, done once:
+    the canonical path around its {fields}, the canonical querystring, and
+    the canonical header lines of its static headers (host and whatever
+    was passed in headers). Signing a request on the route then only fills
+    in the field values, x-hyper-date and the body hash, and computes the
+    HMAC.
+
+    Fields may only stand for whole path segments of unreserved characters
+    (letters, digits, -._~), which canonicalise to themselves; the rest of
+    the path must be the same. Querystrings are fixed. A request the
+    template can't vouch for -- a field value outside that set, a signed
+    header it doesn't know, a static header with another value -- is
+    signed the long way, so templates never change a signature.
+
+    """
+
+    def __init__(self, method, url, headers, include_rules):
+        self.method = method.upper()
+        self.url = url
+        self.include_rules = include_rules
+        pattern, sample, fields = [], [], 0
+        for literal, field, _, _ in string.Formatter().parse(url):
+            pattern.append(re.escape(literal))
+            sample.append(literal)
+            if field is not None:
+                fields += 1
+                pattern.append('({}+)'.format(_UNRESERVED))
+                sample.append('field')
+        sample = ''.join(sample)
+        self.pattern = re.compile(''.join(pattern) + r'\Z') if fields else None
+
+        parsed = urlparse(sample)
+        self.host = parsed.netloc.split(':')[0]
+        self.path_start = len(parsed.scheme) + len('://') + len(parsed.netloc) + 1
+        path = parsed.path[1:]
+        if (not sample.startswith('{}://{}/'.format(parsed.scheme, parsed.netloc)) or parsed.params or
+                parsed.fragment or not _PLAIN_PATH.match(path) or _DOT_SEGMENT.search(path)):
+            raise ValueError('route path must be plain unreserved segments: %r' % url)
+        query_start = sample.find('?')
+        if fields and query_start != -1 and '{' in url[query_start:]:
+            raise ValueError('route fields are only supported in the path: %r' % url)
+        self.cano_qs = FastAWS4Auth.amz_cano_querystring(sample[query_start + 1:] if query_start != -1 else '')
+
+        # lowercased name -> (value as sent, canonical header line)
+        self.static_headers = {}
+        for name, value in list((headers or {}).items()) + [('host', self.host)]:
+            name = name.strip().lower()
+            if _is_included(name, include_rules) and name not in _DYNAMIC_HEADERS:
+                line = '{}:{}\n'.format(name, FastAWS4Auth.amz_norm_whitespace(value).strip())
+                self.static_headers[name] = (value, line)
+        self._layouts = {}
+
+    def _layout(self, dynamic_names):
+        # (canonical header parts in order, signed headers) for this set of
+        # per-request headers; a part is a static line or a dynamic name
+        layout = self._layouts.get(dynamic_names)
+        if layout is None:
+            names = sorted(set(self.static_headers) | dynamic_names)
+            parts = tuple(self.static_headers[name][1] if name in self.static_headers else name for name in names)
+            layout = self._layouts[dynamic_names] = (parts, ';'.join(names))
+        return layout
+
+    def canonical_request(self, req, include_rules, content_hash):
+        """
+        Return (canonical request, signed headers) for req, a request on
+        this route that already carries its date, body hash and host
+        headers. Return None if req isn't one the template can sign.
+
+        """
+        if include_rules != self.include_rules:
+            return None
+        static = self.static_headers
+        dynamic = {}
+        matched = 0
+        headers = req.headers
+        # CaseInsensitiveDict has the lowercased names at hand
+        items = headers.lower_items() if hasattr(headers, 'lower_items') else headers.items()
+        for hdr, val in items:
+            if not isinstance(hdr, str) or not isinstance(val, str):
+                return None
+            name = hdr.strip().lower()
+            if not _is_included(name, include_rules):
+                # AWS4Auth would still tokenise it, which can raise on quotes
+                if '"' in val or "'" in val:
+                    return None
+                continue
+            entry = static.get(name)
+            if entry is not None:
+                if val != entry[0]:
+                    return None
+                matched += 1
+            elif name in _DYNAMIC_HEADERS and name not in dynamic:
+                dynamic[name] = FastAWS4Auth.amz_norm_whitespace(val).strip()
+            else:
+                return None
+        if matched != len(static):
+            return None
+
+        parts, signed_headers = self._layout(frozenset(dynamic))
+        cano_headers = ''.join(part if part[-1] == '\n' else '{}:{}\n'.format(part, dynamic[part]) for part in parts)
+        url = req.url
+        query_start = url.find('?', self.path_start)
+        path = url[self.path_start:query_start] if query_start != -1 else url[self.path_start:]
+        return '\n'.join((self.method, path, self.cano_qs, cano_headers, signed_headers, content_hash)), signed_headers
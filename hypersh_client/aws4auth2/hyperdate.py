@@ -0,0 +1,67 @@
+"""
+Structured x-hyper-date values, formatted once per second.
+
+"""
+
+# Licensed under the MIT License:
+# http://opensource.org/licenses/MIT
+
+import datetime
+import time
+
+
+class HyperDate(str):
+    """
+    An x-hyper-date header value (e.g. 20170101T120000Z) that also carries
+    what the signer needs from it: the date, the key scope date and the
+    epoch second. Being a str it passes through Requests as a normal header
+    value, and FastAWS4Auth reads the fields instead of parsing the string
+    back.
+
+    """
+
+    def __new__(cls, timestamp):
+        timestamp = int(timestamp)
+        t = time.gmtime(timestamp)
+        self = str.__new__(cls, '{:04d}{:02d}{:02d}T{:02d}{:02d}{:02d}Z'.format(
+            t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec))
+        self.timestamp = timestamp
+        self.date = datetime.date(t.tm_year, t.tm_mon, t.tm_mday)
+        self.scope = self[:8]
+        return self
+
+    def __reduce__(self):
+        return HyperDate, (self.timestamp,)
+
+
+class HyperDateCache(object):
+    """
+    Hands out the HyperDate for the current second, building each one once
+    however many requests and threads ask for it within that second.
+
+    offset is added to the clock first, see HypershClient's clock skew
+    handling. The few most recent seconds are kept, so callers using
+    different offsets don't evict each other. Lookups and updates are
+    single dict operations, safe to share between threads without a lock.
+
+    """
+
+    keep = 8
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._recent = {}
+
+    def now(self, offset=0.0):
+        second = int(self.clock() + offset)
+        stamp = self._recent.get(second)
+        if stamp is None:
+            stamp = HyperDate(second)
+            if len(self._recent) >= self.keep:
+                self._recent.clear()
+            self._recent[second] = stamp
+        return stamp
+
+
+# shared by every client and signer in the process
+hyper_dates = HyperDateCache()
@@ -0,0 +1,51 @@
+import random
+import threading
+
+import requests
+
+from hypersh_client.aws4auth2.aws4auth_hypersh import AWS4Auth
+
+
+DATES = ['20161230T235959Z', '20161231T000001Z', '20170101T120000Z', '20170102T080000Z']
+
+
+def _request(i, date):
+    return requests.Request(
+        random.choice(['GET', 'POST', 'DELETE']),
+        'https://us-west-1.hyper.sh/v1.23/containers/c%d/start?force=1&v=%d' % (i, i % 3),
+        headers={'x-hyper-date': date, 'content-type': 'application/json'},
+        json={'n': i} if i % 2 else None,
+    ).prepare()
+
+
+def test_shared_instance_signs_like_fresh_instances():
+    shared = AWS4Auth('access', 'secret', 'us-west-1', 'hyper')
+    jobs = [_request(i, random.choice(DATES)) for i in range(4000)]
+    expected = []
+    for req in jobs:
+        reference = AWS4Auth('access', 'secret', 'us-west-1', 'hyper')
+        expected.append(reference(req.copy()).headers['Authorization'])
+
+    signed = [None] * len(jobs)
+    barrier = threading.Barrier(16)
+
+    def worker(offset):
+        barrier.wait()
+        for i in range(offset, len(jobs), 16):
+            signed[i] = shared(jobs[i].copy()).headers['Authorization']
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert signed == expected
+
+
+def test_session_token_does_not_leak_into_other_instances():
+    with_token = AWS4Auth('access', 'secret', 'us-west-1', 'hyper', session_token='token')
+    plain = AWS4Auth('access', 'secret', 'us-west-1', 'hyper')
+    assert 'x-hyper-security-token' in with_token.include_hdrs
+    assert 'x-hyper-security-token' not in plain.include_hdrs
+    assert 'x-hyper-security-token' not in AWS4Auth.default_include_headers
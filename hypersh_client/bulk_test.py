@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+
+import pytest
+
+from hypersh_client.conftest import StandInHandler
+from hypersh_client.main.hypersh import HypershClient
+from hypersh_client.main.retry import RetryPolicy
+
+
+class BulkHandler(StandInHandler):
+    """
+    Creates and starts containers named after their spec; names starting
+    with bad-create or bad-start fail that step. Later specs answer faster,
+    so responses arrive out of order. Deleting "missing" is a 404, deleting
+    "drop" closes the connection without answering.
+    """
+
+    def _enter(self):
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.peak = max(self.server.peak, self.server.in_flight)
+
+    def _leave(self):
+        with self.server.lock:
+            self.server.in_flight -= 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'null')
+        if self.path.startswith('/v1.23/containers/create'):
+            name = body['Hostname']
+            self._enter()
+            try:
+                time.sleep(0.05 / (1 + int(name.rsplit('-', 1)[-1])))
+            finally:
+                self._leave()
+            if name.startswith('bad-create'):
+                return self.send_json(500, {'message': 'no capacity'})
+            return self.send_json(201, {'Id': 'id-' + name})
+        container_id = self.path.split('/')[-2]
+        self.server.started.append(container_id)
+        self.send_json(400 if container_id.startswith('id-bad-start') else 204)
+
+    def do_GET(self):
+        self.send_json(200, self.server.listed)
+
+    def do_DELETE(self):
+        container_id = self.path.split('?')[0].split('/')[-1]
+        self._enter()
+        try:
+            time.sleep(0.02)
+        finally:
+            self._leave()
+        if container_id == 'drop':
+            self.close_connection = True
+            return
+        self.server.deleted.append(container_id)
+        self.send_json(404 if container_id == 'missing' else 200)
+
+
+@pytest.fixture
+def client(stand_in_server):
+    server = stand_in_server(BulkHandler, lock=threading.Lock(), in_flight=0, peak=0, started=[],
+                             deleted=[], listed=[])
+    client = HypershClient('us-west-1', access_key='access', secret='secret')
+    client.hyper_endpoint = server.endpoint
+    client.server = server
+    return client
+
+
+def test_create_containers_isolates_failures_and_keeps_spec_order(client):
+    names = ['node-0', 'bad-create-1', 'node-2', 'bad-start-3', 'node-4', 'node-5']
+    specs = [{'image': 'selenium/node', 'name': name} for name in names]
+    results = client.create_containers(specs, max_concurrency=3)
+
+    assert [result['spec'] for result in results] == specs
+    assert [(result['id'], result['created'], result['started']) for result in results] == [
+        ('id-node-0', True, True),
+        (None, False, False),
+        ('id-node-2', True, True),
+        ('id-bad-start-3', True, False),
+        ('id-node-4', True, True),
+        ('id-node-5', True, True),
+    ]
+    assert 'no capacity' in results[1]['error']
+    assert results[3]['error'].startswith('/containers/id-bad-start-3/start failed')
+    assert all(result['error'] is None for result in results if result['started'])
+    assert all(result['create_time'] > 0 for result in results if result['created'])
+    assert sorted(client.server.started) == sorted('id-' + name for name in names if name != 'bad-create-1')
+    assert client.server.peak <= 3
+
+
+def test_create_containers_records_exceptions_per_spec(client):
+    results = client.create_containers([{'image': 'selenium/node', 'name': 'node-0'}, {'name': 'no-image'}])
+    assert results[0]['started']
+    assert results[1]['error'].startswith('TypeError')
+
+
+def test_remove_containers_reports_each_delete_and_the_aggregate(client):
+    client.retry_policy = RetryPolicy(max_attempts=1)
+    ids = ['c0', 'missing', 'c2', 'drop', 'c4', 'c5', 'c6']
+    calls = []
+    result = client.remove_containers(ids, max_concurrency=2, progress=lambda *args: calls.append(args))
+
+    assert result['total'] == 7
+    assert sorted(result['removed']) == ['c0', 'c2', 'c4', 'c5', 'c6']
+    assert sorted(result['failed']) == ['drop', 'missing']
+    assert sorted(client.server.deleted) == ['c0', 'c2', 'c4', 'c5', 'c6', 'missing']
+    assert client.server.peak <= 2
+    # one call per container, from this thread, counting up to the total
+    assert sorted(call[0] for call in calls) == sorted(ids)
+    assert [call[2:] for call in calls] == [(n, 7) for n in range(1, 8)]
+    assert dict((call[0], call[1]) for call in calls)['missing'] is False
+    assert client.remove_containers([]) == {'total': 0, 'removed': [], 'failed': []}
+
+
+def test_remove_all_containers_removes_what_the_listing_matches(client):
+    client.server.listed = [
+        {'Id': 'c1', 'Names': ['/node-1'], 'State': 'running', 'Image': 'selenium/node'},
+        {'Id': 'c2', 'Names': ['/hub'], 'State': 'running', 'Image': 'selenium/hub'},
+        {'Id': 'missing', 'Names': ['/node-2'], 'State': 'exited', 'Image': 'selenium/node'},
+    ]
+    success, result = client.remove_all_containers(image='selenium/node')
+    assert success
+    assert (sorted(result['removed']), result['failed']) == (['c1'], ['missing'])
+    assert client.remove_all_containers_with_image('selenium/node')
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from hypersh_client.conftest import StandInHandler
+from hypersh_client.main.cache import InventoryCache
+from hypersh_client.main.hypersh import HypershClient
+
+
+RECORDS = [
+    {'Id': 'c1', 'Names': ['/hub'], 'State': 'running', 'Image': 'selenium/hub', 'Labels': {}},
+    {'Id': 'c2', 'Names': ['/node'], 'State': 'exited', 'Image': 'selenium/node', 'Labels': {}},
+]
+
+
+def _cache(now, ttl=10):
+    cache = InventoryCache(ttl, clock=lambda: now[0])
+    cache.set_containers(RECORDS)
+    cache.set_fips([{'fip': '1.2.3.4', 'container': ''}])
+    return cache
+
+
+def _ids(cache):
+    return sorted(di['Id'] for di in cache.get_containers())
+
+
+def test_entries_expire_after_ttl_and_lookups_are_counted():
+    now = [100.0]
+    cache = _cache(now)
+    assert _ids(cache) == ['c1', 'c2']
+    now[0] = 109.9
+    assert cache.get_fips() == [{'fip': '1.2.3.4', 'container': ''}]
+    now[0] = 110.0
+    assert cache.get_containers() is None
+    assert cache.get_fips() is None
+    assert cache.get_containers(count_miss=False) is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_ratio']) == (2, 2, 0.5)
+
+    cache.set_containers(RECORDS[:1])
+    assert _ids(cache) == ['c1']
+
+
+def test_mutations_are_written_through():
+    now = [100.0]
+    cache = _cache(now)
+    cache.put_container({'Id': 'c3', 'Names': ['/new'], 'State': 'created', 'Image': 'selenium/node'})
+    cache.update_container('c3', State='running')
+    cache.update_container('missing', State='running')
+    cache.discard_container('c2')
+    cache.attach_fip('1.2.3.4', 'c3')
+
+    containers = dict((di['Id'], di) for di in cache.get_containers())
+    assert sorted(containers) == ['c1', 'c3']
+    assert containers['c3']['State'] == 'running'
+    assert cache.get_fips() == [{'fip': '1.2.3.4', 'container': 'c3'}]
+    # the listing's own records are not modified in place
+    assert RECORDS[1]['State'] == 'exited'
+
+
+def test_invalidate_drops_everything():
+    cache = _cache([100.0])
+    cache.invalidate()
+    assert cache.get_containers() is None
+    assert cache.get_fips() is None
+    assert cache.stats()['invalidations'] == 1
+
+
+class InventoryHandler(StandInHandler):
+
+    def do_GET(self):
+        self.server.listings.append(self.path)
+        if self.path.startswith('/v1.23/containers/json'):
+            return self.send_json(200, RECORDS)
+        self.send_json(200, [{'fip': '1.2.3.4'}])
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'null')
+        if self.path.startswith('/v1.23/containers/create'):
+            return self.send_json(201, {'Id': 'new-' + body.get('Hostname', 'unnamed')})
+        self.send_json(200 if self.path.startswith('/v1.23/fips/attach') else 204)
+
+    def do_DELETE(self):
+        self.send_json(200)
+
+
+@pytest.fixture
+def client(stand_in_server):
+    server = stand_in_server(InventoryHandler, listings=[])
+    client = HypershClient('us-west-1', cache_ttl=60, access_key='access', secret='secret')
+    client.hyper_endpoint = server.endpoint
+    client.server = server
+    return client
+
+
+def test_client_serves_listings_from_cache_and_writes_through(client):
+    assert [di['id'] for di in client.get_containers()[1]] == ['c1', 'c2']
+    assert client.get_fips() == (True, ['1.2.3.4'])
+    assert client.create_container('selenium/node', name='node-2') == (True, 'new-node-2')
+    assert client.remove_container('c2')
+    assert client.attach_fip('c1', '1.2.3.4')
+
+    success, containers = client.get_containers()
+    assert sorted((di['id'], di['state']) for di in containers) == [('c1', 'running'), ('new-node-2', 'running')]
+    assert client.cache.get_fips() == [{'fip': '1.2.3.4', 'container': 'c1'}]
+    assert len(client.server.listings) == 2
+
+    # streamed listings can't fill the cache, so they don't count as misses
+    client.invalidate_cache()
+    misses = client.cache_stats()['misses']
+    assert [di['id'] for di in client.iter_containers(state='running')] == ['c1']
+    assert client.cache_stats()['misses'] == misses
+
+
+def test_unnamed_create_is_listed_from_cache(client):
+    assert client.get_containers()[0]
+    listings = list(client.server.listings)
+    assert client.create_container('selenium/node') == (True, 'new-unnamed')
+
+    success, containers = client.get_containers()
+    assert success
+    assert dict((di['id'], di['name']) for di in containers)['new-unnamed'] is None
+    assert [di for di in client.iter_containers(fields=('id', 'name')) if di['id'] == 'new-unnamed'] == [
+        {'id': 'new-unnamed', 'name': None}]
+    # both served from the cache
+    assert client.server.listings == listings
@@ -0,0 +1,84 @@
+import calendar
+import email.utils
+import time
+
+import pytest
+
+from hypersh_client.conftest import StandInHandler
+from hypersh_client.main.clockskew import ClockSkew
+from hypersh_client.main.hypersh import HypershClient
+from hypersh_client.main.retry import CircuitBreaker
+
+
+SERVER_AHEAD = 3600
+TOLERANCE = 300
+
+
+class SkewedHandler(StandInHandler):
+    """Runs an hour fast and rejects requests dated too far from its clock."""
+
+    def date_time_string(self, timestamp=None):
+        return email.utils.formatdate(time.time() + SERVER_AHEAD, usegmt=True)
+
+    def do_GET(self):
+        stamp = calendar.timegm(time.strptime(self.headers['x-hyper-date'], '%Y%m%dT%H%M%SZ'))
+        self.server.stamps.append(stamp - time.time())
+        if abs(stamp - (time.time() + SERVER_AHEAD)) > TOLERANCE:
+            status, body = 403, {'message': 'Signature expired: request time is too skewed'}
+        else:
+            status, body = 200, []
+        self.send_json(status, body)
+
+
+@pytest.fixture
+def skewed_server(stand_in_server):
+    return stand_in_server(SkewedHandler, stamps=[])
+
+
+def test_rejected_date_is_corrected_and_resigned_once(skewed_server):
+    client = HypershClient('us-west-1', access_key='access', secret='secret', clock_skew=ClockSkew())
+    client.hyper_endpoint = skewed_server.endpoint
+
+    assert client.get_fips() == (True, [])
+    assert len(skewed_server.stamps) == 2
+    assert abs(skewed_server.stamps[1] - SERVER_AHEAD) < 3
+    assert abs(client.clock_skew.offset - SERVER_AHEAD) < 3
+
+    # later requests are stamped with the server's time straight away
+    assert client.get_containers()[0]
+    assert len(skewed_server.stamps) == 3
+
+
+def test_resign_during_half_open_trial_closes_the_circuit(skewed_server):
+    now = [1000.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] += 30.0
+    client = HypershClient('us-west-1', access_key='access', secret='secret',
+                           circuit_breaker=breaker, clock_skew=ClockSkew())
+    client.hyper_endpoint = skewed_server.endpoint
+
+    # the trial is rejected for its date, re-signed and sent again
+    assert client.get_fips() == (True, [])
+    assert len(skewed_server.stamps) == 2
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert client.get_containers()[0]
+
+
+def test_unrelated_403_is_not_resigned():
+    skew = ClockSkew()
+    now = time.time()
+    date = email.utils.formatdate(now, usegmt=True)
+    assert not skew.correct(date, now, now, 0.0, 'container not owned by this tenant')
+    assert not skew.correct(None, now, now, 0.0, 'request time too skewed')
+
+
+def test_samples_are_smoothed():
+    skew = ClockSkew(smoothing=0.5)
+    now = time.time()
+    skew.observe(email.utils.formatdate(now + 10, usegmt=True), now, now)
+    first = skew.offset
+    assert abs(first - 10) <= 1
+    later = email.utils.formatdate(now + 20, usegmt=True)
+    skew.observe(later, now, now)
+    assert skew.offset == pytest.approx(first + 0.5 * (skew.measure(later, now, now) - first))
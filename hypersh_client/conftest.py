@@ -0,0 +1,48 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Base for the request handlers that stand in for the hyper.sh API in tests."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, body=None):
+        data = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def stand_in_server():
+    """
+    Starts a local stand-in API: stand_in_server(handler, **attributes) serves
+    handler on a free port, sets attributes on the server for the handler to
+    use, and returns the server. server.endpoint is what a client's
+    hyper_endpoint should be set to.
+    """
+    servers = []
+
+    def start(handler, **attributes):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.daemon_threads = True
+        for name, value in attributes.items():
+            setattr(server, name, value)
+        server.endpoint = 'http://127.0.0.1:%s/v1.23' % server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
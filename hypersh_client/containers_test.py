@@ -0,0 +1,146 @@
+import pytest
+
+from hypersh_client.conftest import StandInHandler
+from hypersh_client.main.containers import Container, ContainerSet
+from hypersh_client.main.hypersh import HypershClient
+
+
+RECORDS = [
+    {'Id': 'c1', 'Names': ['/hub'], 'State': 'running', 'Image': 'selenium/hub', 'Labels': {'role': 'hub'}},
+    {'Id': 'c2', 'Names': ['/node-1', '/hub/node-1'], 'State': 'running', 'Image': 'selenium/node',
+     'Labels': {'role': 'node'}},
+    {'Id': 'c3', 'Names': ['/node-2'], 'State': 'exited', 'Image': 'selenium/node', 'Labels': {}},
+]
+
+
+def test_from_api():
+    hub = Container.from_api(RECORDS[0])
+    assert (hub.id, hub.name, hub.state, hub.image, hub.labels) == ('c1', 'hub', 'running', 'selenium/hub', {'role': 'hub'})
+    # the first name wins, without its leading slash
+    assert Container.from_api(RECORDS[1]).name == 'node-1'
+    # empty labels are not kept
+    assert Container.from_api(RECORDS[2]).labels is None
+    assert hub.as_dict() == {'id': 'c1', 'name': 'hub', 'state': 'running', 'image': 'selenium/hub'}
+
+
+def test_from_api_without_names_or_optional_fields():
+    for record in ({'Id': 'c4', 'Names': [], 'State': 'created', 'Image': 'img'},
+                   {'Id': 'c4', 'Names': None, 'State': 'created', 'Image': 'img'},
+                   {'Id': 'c4', 'State': 'created', 'Image': 'img'}):
+        container = Container.from_api(record)
+        assert (container.id, container.name, container.state, container.labels) == ('c4', None, 'created', None)
+
+    bare = Container.from_api({'Id': 'c5'})
+    assert (bare.name, bare.state, bare.image, bare.labels) == (None, None, None, None)
+
+
+def test_image_and_state_are_interned():
+    # built at runtime, so equal but not identical until interned
+    first = Container.from_api({'Id': 'c1', 'State': ''.join(['run', 'ning']), 'Image': '/'.join(['selenium', 'node'])})
+    second = Container.from_api({'Id': 'c2', 'State': ''.join(['runn', 'ing']), 'Image': '/'.join(['selenium', 'node'])})
+    assert first.state is second.state
+    assert first.image is second.image
+
+
+def test_records_compare_by_value_and_have_no_dict():
+    assert Container.from_api(RECORDS[0]) == Container.from_api(dict(RECORDS[0]))
+    assert Container.from_api(RECORDS[0]) != Container.from_api(dict(RECORDS[0], State='exited'))
+    assert Container.from_api(RECORDS[0]) != RECORDS[0]
+    assert not hasattr(Container.from_api(RECORDS[0]), '__dict__')
+    with pytest.raises(TypeError):
+        hash(Container.from_api(RECORDS[0]))
+
+
+def _indexes(containers):
+    return {
+        'ids': sorted(containers.ids()),
+        'names': dict((name, containers.get_by_name(name).id) for name in ('hub', 'node-1', 'node-2', 'node-3')
+                      if containers.get_by_name(name) is not None),
+        'images': dict((image, sorted(c.id for c in containers.with_image(image))) for image in sorted(containers.images())),
+        'states': dict((state, sorted(c.id for c in containers.with_state(state))) for state in sorted(containers.states())),
+    }
+
+
+def test_container_set_indexes():
+    containers = ContainerSet(Container.from_api(di) for di in RECORDS)
+    assert len(containers) == 3
+    assert 'c2' in containers and 'c9' not in containers
+    assert containers.get('c2').name == 'node-1'
+    assert containers.get('c9') is None and containers.get('c9', 'missing') == 'missing'
+    assert _indexes(containers) == {
+        'ids': ['c1', 'c2', 'c3'],
+        'names': {'hub': 'c1', 'node-1': 'c2', 'node-2': 'c3'},
+        'images': {'selenium/hub': ['c1'], 'selenium/node': ['c2', 'c3']},
+        'states': {'exited': ['c3'], 'running': ['c1', 'c2']},
+    }
+    assert containers.with_image('busybox') == [] and containers.with_state('paused') == []
+    assert sorted(containers.as_dicts(), key=lambda di: di['id'])[0] == Container.from_api(RECORDS[0]).as_dict()
+
+
+def test_container_set_add_replace_and_discard():
+    containers = ContainerSet(Container.from_api(di) for di in RECORDS)
+
+    containers.add(Container('c4', None, 'created', 'selenium/node'))
+    assert _indexes(containers)['states'] == {'created': ['c4'], 'exited': ['c3'], 'running': ['c1', 'c2']}
+    assert _indexes(containers)['images']['selenium/node'] == ['c2', 'c3', 'c4']
+
+    # replacing c3 under a new name, state and image leaves nothing behind in the old groups
+    containers.add(Container('c3', 'node-3', 'running', 'selenium/hub'))
+    assert len(containers) == 4
+    assert _indexes(containers) == {
+        'ids': ['c1', 'c2', 'c3', 'c4'],
+        'names': {'hub': 'c1', 'node-1': 'c2', 'node-3': 'c3'},
+        'images': {'selenium/hub': ['c1', 'c3'], 'selenium/node': ['c2', 'c4']},
+        'states': {'created': ['c4'], 'running': ['c1', 'c2', 'c3']},
+    }
+
+    removed = containers.discard('c4')
+    assert removed.id == 'c4'
+    assert containers.discard('c4') is None
+    assert _indexes(containers)['states'] == {'running': ['c1', 'c2', 'c3']}
+
+    for container_id in ('c1', 'c2', 'c3'):
+        containers.discard(container_id)
+    assert len(containers) == 0
+    assert _indexes(containers) == {'ids': [], 'names': {}, 'images': {}, 'states': {}}
+
+
+def test_discard_keeps_a_name_taken_over_by_another_container():
+    containers = ContainerSet([Container('old', 'hub', 'exited', 'selenium/hub')])
+    containers.add(Container('new', 'hub', 'running', 'selenium/hub'))
+    containers.discard('old')
+    assert containers.get_by_name('hub').id == 'new'
+
+
+class ListingHandler(StandInHandler):
+
+    def do_GET(self):
+        self.server.listings += 1
+        self.send_json(200, RECORDS)
+
+
+def _client(stand_in_server, **kwargs):
+    server = stand_in_server(ListingHandler, listings=0)
+    client = HypershClient('us-west-1', access_key='access', secret='secret', **kwargs)
+    client.hyper_endpoint = server.endpoint
+    return client, server
+
+
+def test_get_containers_as_records(stand_in_server):
+    client, _ = _client(stand_in_server)
+    success, containers = client.get_containers(state='running', as_records=True)
+    assert success
+    assert isinstance(containers, ContainerSet)
+    assert sorted(containers.ids()) == ['c1', 'c2']
+    assert containers.get_by_name('hub').labels == {'role': 'hub'}
+    assert client.get_containers(state='running')[1] == sorted(containers.as_dicts(), key=lambda di: di['id'])
+
+
+def test_cached_listings_as_records(stand_in_server):
+    client, server = _client(stand_in_server, cache_ttl=60)
+    success, containers = client.get_containers(image='selenium/node', as_records=True)
+    assert success
+    assert sorted(containers.ids()) == ['c2', 'c3']
+    records = list(client.iter_containers(name='hub', as_records=True))
+    assert records == [Container.from_api(RECORDS[0])]
+    assert server.listings == 1
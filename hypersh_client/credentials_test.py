@@ -0,0 +1,106 @@
+import json
+
+import pytest
+import requests
+
+from hypersh_client.aws4auth2.aws4auth_hypersh import AWS4Auth
+from hypersh_client.main.credentials import (
+    CallbackCredentials, ConfigFileCredentials, CredentialChain, Credentials, NoCredentialsError,
+    default_credentials,
+)
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    monkeypatch.delenv('HYPERSH_ACCESS_KEY', raising=False)
+    monkeypatch.delenv('HYPERSH_SECRET', raising=False)
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'clouds': {
+        'tcp://eu-central-1.hyper.sh:443': {'accesskey': 'eu-key', 'secretkey': 'eu-secret'},
+        'tcp://us-west-1.hyper.sh:443': {'accesskey': 'us-key', 'secretkey': 'us-secret'},
+    }}))
+    return str(path)
+
+
+def test_lookup_order(config, monkeypatch):
+    def chain(**kwargs):
+        return default_credentials(region='us-west-1', config_path=config, **kwargs)
+
+    assert chain(access_key='key', secret='secret').get().access_id == 'key'
+    monkeypatch.setenv('HYPERSH_ACCESS_KEY', 'env-key')
+    monkeypatch.setenv('HYPERSH_SECRET', 'env-secret')
+    assert chain(access_key='key', secret='secret').get().access_id == 'key'
+    assert chain().get().access_id == 'env-key'
+    monkeypatch.delenv('HYPERSH_SECRET')
+    assert chain().get().access_id == 'us-key'
+
+    missing = str(config) + '.missing'
+    assert default_credentials(config_path=missing, callback=lambda: ('cb-key', 'cb-secret')).get().access_id == 'cb-key'
+    with pytest.raises(NoCredentialsError):
+        default_credentials(config_path=missing).get()
+
+
+def test_config_file_prefers_the_region(config, tmp_path):
+    assert ConfigFileCredentials(config, region='eu-central-1').load().access_id == 'eu-key'
+    assert ConfigFileCredentials(config, region='us-west-1').load().secret_key == 'us-secret'
+    # no region: the first cloud by name
+    assert ConfigFileCredentials(config).load().access_id == 'eu-key'
+
+    broken = tmp_path / 'broken.json'
+    broken.write_text('{"clouds": ')
+    assert ConfigFileCredentials(str(broken)).load() is None
+    empty = tmp_path / 'empty.json'
+    empty.write_text(json.dumps({'clouds': {'tcp://us-west-1.hyper.sh:443': {'accesskey': 'key'}}}))
+    assert ConfigFileCredentials(str(empty)).load() is None
+
+
+def test_callback_ttl_and_refresh():
+    issued = []
+
+    def callback():
+        issued.append('key-%d' % len(issued))
+        return issued[-1], 'secret'
+
+    chain = CredentialChain([CallbackCredentials(callback, ttl=3600)])
+    first = chain.get()
+    assert chain.get() is first
+    assert chain.refresh().access_id == 'key-1'
+    assert chain.get().access_id == 'key-1'
+
+    # expired at once, so every get() asks the callback again
+    chain = CredentialChain([CallbackCredentials(callback, ttl=0)])
+    assert chain.get().access_id == 'key-2'
+    assert chain.get().access_id == 'key-3'
+
+    # Credentials returned by the callback keep their own expiry
+    chain = CredentialChain([CallbackCredentials(lambda: Credentials('key', 'secret', expires=None), ttl=0)])
+    assert chain.get() is chain.get()
+
+
+def test_signer_builds_a_new_key_when_credentials_rotate():
+    rotation = [Credentials('key-1', 'secret-1', session_token='token-1')]
+    chain = CredentialChain([CallbackCredentials(lambda: rotation[0])])
+    auth = AWS4Auth(None, None, 'us-west-1', 'hyper', credentials=chain)
+
+    def sign():
+        req = requests.Request('GET', 'https://us-west-1.hyper.sh/v1.23/fips',
+                               headers={'content-type': 'application/json'}).prepare()
+        return auth(req).headers
+
+    headers = sign()
+    access_id, key, credentials = auth.get_signing_state()
+    assert (access_id, credentials.session_token) == ('key-1', 'token-1')
+    assert 'Credential=key-1/' in headers['Authorization']
+    assert headers['x-hyper-security-token'] == 'token-1'
+    assert auth.get_signing_state()[1] is key
+
+    rotation[0] = Credentials('key-2', 'secret-2', session_token='token-2')
+    assert auth.get_signing_state()[1] is key
+    chain.refresh()
+    headers = sign()
+    access_id, new_key, credentials = auth.get_signing_state()
+    assert access_id == 'key-2'
+    assert new_key is not key and new_key.key != key.key
+    assert new_key.scope == key.scope
+    assert 'Credential=key-2/' in headers['Authorization']
+    assert headers['x-hyper-security-token'] == 'token-2'
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from hypersh_client.conftest import StandInHandler
+from hypersh_client.main.hypersh import HypershClient
+from hypersh_client.main.retry import RetryPolicy
+
+try:
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from urlparse import parse_qs, urlparse
+
+
+BASE_NANO = 1500000000 * 10 ** 9
+
+EVENTS = [
+    {'id': 'c%d' % (i // 2), 'Type': 'container', 'Action': 'start' if i % 2 else 'create',
+     'time': (BASE_NANO + i * 10 ** 8) // 10 ** 9, 'timeNano': BASE_NANO + i * 10 ** 8}
+    for i in range(12)
+]
+
+
+class EventsHandler(StandInHandler):
+
+    def _chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        self.server.requests.append((query, dict(self.headers)))
+        since = query.get('since', ['0'])[0]
+        seconds, _, fraction = since.partition('.')
+        since_nano = int(seconds) * 10 ** 9 + int((fraction + '000000000')[:9])
+        # since is inclusive, so the resume point is sent again
+        pending = [e for e in EVENTS if e['timeNano'] >= since_nano]
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        drop_after = self.server.drops.pop(0) if self.server.drops else None
+        for n, event in enumerate(pending):
+            line = json.dumps(event).encode() + b'\n'
+            if drop_after is not None and n == drop_after:
+                # die halfway through a line, without the terminating chunk
+                self._chunk(line[:len(line) // 2])
+                self.close_connection = True
+                return
+            self._chunk(line)
+        self._chunk(b'')
+
+
+@pytest.fixture
+def events_server(stand_in_server):
+    return stand_in_server(EventsHandler, requests=[], drops=[])
+
+
+def _client(server):
+    client = HypershClient(
+        'us-west-1', access_key='access', secret='secret',
+        retry_policy=RetryPolicy(sleep=lambda seconds: None),
+    )
+    client.hyper_endpoint = server.endpoint
+    return client
+
+
+def test_events_are_yielded_incrementally_and_signed(events_server):
+    client = _client(events_server)
+    events = client.iter_events(until=BASE_NANO // 10 ** 9 + 10, filters={'type': ['container']})
+    assert next(events) == EVENTS[0]
+    assert list(events) == EVENTS[1:]
+    query, headers = events_server.requests[0]
+    assert json.loads(query['filters'][0]) == {'type': ['container']}
+    assert headers['Authorization'].startswith('HYPER-HMAC-SHA256 Credential=access/')
+
+
+def test_reconnects_and_resumes_without_loss_or_duplicates(events_server):
+    events_server.drops = [4, 3]
+    client = _client(events_server)
+    events = list(client.iter_events(until=BASE_NANO // 10 ** 9 + 10))
+    assert events == EVENTS
+    assert len(events_server.requests) == 3
+    # resumed from the last event seen on each broken connection
+    assert events_server.requests[1][0]['since'] == ['1500000000.300000000']
+    assert events_server.requests[2][0]['since'] == ['1500000000.500000000']
+
+
+def test_gives_up_after_max_reconnects(events_server):
+    events_server.drops = [0, 0, 0]
+    client = _client(events_server)
+    with pytest.raises(Exception):
+        list(client.iter_events(until=BASE_NANO // 10 ** 9 + 10, max_reconnects=2))
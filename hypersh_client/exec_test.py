@@ -0,0 +1,58 @@
+import json
+import struct
+import time
+
+import pytest
+
+from hypersh_client.conftest import StandInHandler
+from hypersh_client.main.hypersh import HypershClient
+
+
+PROBE_SECONDS = 0.3
+
+
+class ExecHandler(StandInHandler):
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b'{}')
+        parts = self.path.split('/')
+        if parts[-1] == 'exec':
+            self.server.execs[parts[-2]] = body
+            return self.send_json(201, {'Id': 'exec-' + parts[-2]})
+        # /exec/<id>/start: hijacked stream, read until close
+        container_id = parts[-2][len('exec-'):]
+        time.sleep(PROBE_SECONDS)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.docker.raw-stream')
+        self.end_headers()
+        for stream, payload in ((1, b'ok from %s\n' % container_id.encode()), (2, b'warn\n')):
+            self.wfile.write(struct.pack('>BxxxI', stream, len(payload)) + payload)
+        self.close_connection = True
+
+    def do_GET(self):
+        container_id = self.path.split('/')[-2][len('exec-'):]
+        self.send_json(200, {'Running': False, 'ExitCode': 1 if container_id == 'bad' else 0})
+
+
+@pytest.fixture
+def exec_server(stand_in_server):
+    return stand_in_server(ExecHandler, execs={})
+
+
+def test_exec_many_runs_concurrently_and_collects_exit_codes(exec_server):
+    client = HypershClient('us-west-1', access_key='access', secret='secret')
+    client.hyper_endpoint = exec_server.endpoint
+    container_ids = ['c%d' % i for i in range(7)] + ['bad']
+
+    started = time.time()
+    results = client.exec_many(container_ids, 'curl -sf localhost:5555/status', max_concurrency=10)
+    elapsed = time.time() - started
+
+    assert elapsed < PROBE_SECONDS * 3
+    assert [r['container_id'] for r in results] == container_ids
+    for result in results:
+        assert result['error'] is None
+        assert result['stdout'] == b'ok from %s\n' % result['container_id'].encode()
+        assert result['stderr'] == b'warn\n'
+    assert [r['exit_code'] for r in results] == [0] * 7 + [1]
+    assert exec_server.execs['c0']['Cmd'] == ['/bin/sh', '-c', 'curl -sf localhost:5555/status']
@@ -0,0 +1,198 @@
+import datetime
+import random
+import types
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from hypersh_client.aws4auth2 import aws4auth_hypersh, fast_aws4auth
+from hypersh_client.aws4auth2.aws4auth_hypersh import AWS4Auth
+from hypersh_client.aws4auth2.fast_aws4auth import FastAWS4Auth
+from hypersh_client.aws4auth2.hyperdate import HyperDate, HyperDateCache
+
+
+class FrozenDatetime(datetime.datetime):
+    @classmethod
+    def utcnow(cls):
+        return cls(2017, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture(autouse=True)
+def frozen_clock(monkeypatch):
+    # requests without a usable date are stamped with utcnow by both signers
+    frozen = types.SimpleNamespace(datetime=FrozenDatetime, date=datetime.date)
+    monkeypatch.setattr(aws4auth_hypersh, 'datetime', frozen)
+    monkeypatch.setattr(FastAWS4Auth, 'hyper_dates', HyperDateCache(clock=lambda: 1483272000))
+
+
+METHODS = ['GET', 'POST', 'DELETE', 'PUT', 'HEAD', 'get', 'Patch']
+PATH_PIECES = ['containers', 'json', 'c1', 'exec', 'a-b_c.d~e', '.', '..', '', '%2F', '%41', '%zz', ' ', ';p=1',
+               ':', '@', '!', '$', '+', '=', ',', "'", '*', '(x)', 'é', '☃', 'v1.23']
+QUERY_PIECES = ['all', '1', 'v', 'force', 'a-b.c~', '=', '&', '&&', '+', '%20', '%2B', '%', '%zz', ' ', '#frag',
+                ';', '{"status":["running"]}', '%7B%22label%22%3A%5B%22a%3Db%22%5D%7D', 'é', '[', ']']
+HEADER_NAMES = ['x-hyper-foo', 'X-Hyper-Bar', 'x-hyper-client-context', 'Accept', 'User-Agent', 'content-type',
+                'Content-Type', 'Host', 'X-Custom', ' x-hyper-padded ', 'x-hyper-security-token']
+VALUE_PIECES = ['a', 'b c', '  ', '\t', '\r\n', '\x0b', ',', '"quoted  value"', "'single'", '"unbalanced', 'x"y',
+                'é', 'application/json', '#', '\\', '=']
+DATES = [None, '20170101T120000Z', '20161231T235959Z', '20170230T000000Z', '20170101T120000Z\n',
+         'Mon, 09 Sep 2011 23:36:00 GMT', 'Sunday, 06-Nov-94 08:49:37 GMT', 'Wed Dec 4 00:00:00 2002',
+         '2009-03-25T10:11:12.13-01:00', 'yesterday', 'Mon, 09 Xyz 2011 23:36:00 GMT']
+
+
+def _pick(rng, pieces, most):
+    return ''.join(rng.choice(pieces) for _ in range(rng.randint(0, most)))
+
+
+def _random_request(rng):
+    path = '/' + '/'.join(_pick(rng, PATH_PIECES, 2) for _ in range(rng.randint(0, 4)))
+    if rng.random() < 0.2:
+        path += '/'
+    url = rng.choice(['https://us-west-1.hyper.sh', 'http://127.0.0.1:8080', 'https://user:pw@h.example']) + path
+    if rng.random() < 0.7:
+        url += '?' + _pick(rng, QUERY_PIECES, 8)
+
+    headers = CaseInsensitiveDict()
+    for _ in range(rng.randint(0, 5)):
+        headers[rng.choice(HEADER_NAMES)] = _pick(rng, VALUE_PIECES, 4)
+    date = rng.choice(DATES)
+    if date is not None:
+        headers[rng.choice(['x-hyper-date', 'x-hyper-date', 'x-hyper-date', 'Date'])] = date
+
+    req = requests.PreparedRequest()
+    req.method = rng.choice(METHODS)
+    req.url = url
+    req.headers = headers
+    req.body = rng.choice([None, b'', b'{"a": 1}', '{"b": "é"}', 'plain text'])
+    return req
+
+
+def _outcome(auth, req):
+    try:
+        signed = auth(req)
+    except Exception as e:
+        return 'error', type(e)
+    return 'ok', dict(signed.headers), signed.body
+
+
+@pytest.mark.parametrize('seed', range(8))
+@pytest.mark.parametrize('service', ['hyper', 'host'])
+def test_fast_signer_matches_reference(seed, service):
+    rng = random.Random(seed)
+    # shared across the run, so key regeneration on date mismatches is compared too
+    reference = AWS4Auth('access', 'secret', 'us-west-1', service, '20170101')
+    fast = FastAWS4Auth('access', 'secret', 'us-west-1', service, '20170101')
+    for _ in range(500):
+        req = _random_request(rng)
+        assert _outcome(fast, req.copy()) == _outcome(reference, req.copy()), (req.method, req.url, dict(req.headers))
+        assert fast.date == reference.date
+
+
+ENDPOINT = 'https://us-west-1.hyper.sh/v1.23'
+ROUTES = [('GET', '/containers/json?all=1'), ('DELETE', '/containers/{id}?v=1&force=1'),
+          ('POST', '/containers/{id}/start'), ('GET', '/exec/{id}/json')]
+IDS = ['c1', 'f3a9e0c2b1d4', 'a-b_c.d~e', '.', '..', '%2F', 'a b', 'é', '', 'x/y']
+
+
+def _route_request(rng):
+    method, path = rng.choice(ROUTES)
+    url = ENDPOINT + path.replace('{id}', rng.choice(IDS))
+    if rng.random() < 0.1:
+        url += rng.choice(['&x=1', '/', '?'])
+    headers = {'x-hyper-date': rng.choice(['20170101T120000Z', '20170102T000000Z']),
+               'content-type': 'application/json' if rng.random() < 0.9 else 'text/plain'}
+    if rng.random() < 0.1:
+        headers[rng.choice(['x-hyper-extra', 'Host', 'User-Agent'])] = rng.choice(['v', 'a  "b  c"', '"open'])
+    req = requests.Request(method if rng.random() < 0.9 else rng.choice(METHODS), url, headers=headers,
+                           json={'i': rng.random()} if method == 'POST' and rng.random() < 0.5 else None)
+    return req.prepare()
+
+
+@pytest.mark.parametrize('session_token', [None, 'token  with spaces'])
+def test_route_templates_match_reference(session_token):
+    rng = random.Random(7)
+    reference = AWS4Auth('access', 'secret', 'us-west-1', 'hyper', '20170101', session_token=session_token)
+    fast = FastAWS4Auth('access', 'secret', 'us-west-1', 'hyper', '20170101', session_token=session_token)
+    for method, path in ROUTES:
+        fast.add_route(method, ENDPOINT + path, {'content-type': 'application/json'})
+    for _ in range(2000):
+        req = _route_request(rng)
+        assert _outcome(fast, req.copy()) == _outcome(reference, req.copy()), (req.method, req.url, dict(req.headers))
+
+
+def test_route_template_signs_plain_requests_without_fallback(monkeypatch):
+    reference = AWS4Auth('access', 'secret', 'us-west-1', 'hyper', '20170101')
+    fast = FastAWS4Auth('access', 'secret', 'us-west-1', 'hyper', '20170101')
+    route = fast.add_route('DELETE', ENDPOINT + '/containers/{id}?v=1&force=1', {'content-type': 'application/json'})
+    req = requests.Request('DELETE', ENDPOINT + '/containers/f3a9e0c2b1d4?v=1&force=1',
+                           headers={'x-hyper-date': '20170101T120000Z', 'content-type': 'application/json'}).prepare()
+    assert fast.match_route('DELETE', req.url) is route
+    assert fast.match_route('DELETE', ENDPOINT + '/containers/..?v=1&force=1') is None
+
+    def long_way(*args):
+        raise AssertionError('signed without the template')
+
+    monkeypatch.setattr(fast, 'get_canonical_headers', long_way)
+    assert fast(req.copy()).headers == reference(req.copy()).headers
+
+
+def test_route_fields_must_be_path_segments():
+    fast = FastAWS4Auth('access', 'secret', 'us-west-1', 'hyper', '20170101')
+    with pytest.raises(ValueError):
+        fast.add_route('GET', ENDPOINT + '/containers/json?name={name}')
+    with pytest.raises(ValueError):
+        fast.add_route('GET', ENDPOINT + '/containers/{id} x')
+
+
+def test_signers_keep_their_own_url_memo():
+    first = FastAWS4Auth('access', 'secret', 'us-west-1', 'hyper', '20170101')
+    second = FastAWS4Auth('access', 'secret', 'us-west-1', 'hyper', '20170101')
+    first(requests.Request('GET', ENDPOINT + '/fips').prepare())
+    assert first._url_memo
+    assert not second._url_memo
+    assert '_url_memo' not in vars(FastAWS4Auth)
+
+
+def test_sign_batch_matches_signing_one_by_one():
+    rng = random.Random(3)
+    batch = [_route_request(rng) for _ in range(300)] + [_random_request(rng) for _ in range(300)]
+    fast = FastAWS4Auth('access', 'secret', 'us-west-1', 'hyper', '20161231')
+    for method, path in ROUTES:
+        fast.add_route(method, ENDPOINT + path, {'content-type': 'application/json'})
+    # leave out the requests whose headers make signing fail either way
+    batch = [req for req in batch if _outcome(AWS4Auth('access', 'secret', 'us-west-1', 'hyper'), req.copy())[0] == 'ok']
+
+    signed = fast.sign_batch([req.copy() for req in batch])
+    assert fast.date == '20170101'
+    reference = AWS4Auth('access', 'secret', 'us-west-1', 'hyper', '20170101')
+    for original, batched in zip(batch, signed):
+        assert batched.headers['x-hyper-date'] == '20170101T120000Z'
+        one = original.copy()
+        one.headers['x-hyper-date'] = '20170101T120000Z'
+        assert dict(batched.headers) == dict(reference(one).headers)
+
+
+def test_hyper_date_is_signed_without_parsing(monkeypatch):
+    stamp = HyperDate(1483272000)
+    assert (stamp, stamp.scope, stamp.date) == ('20170101T120000Z', '20170101', datetime.date(2017, 1, 1))
+    req = requests.Request('GET', ENDPOINT + '/fips', headers={'x-hyper-date': stamp,
+                                                               'content-type': 'application/json'}).prepare()
+    assert req.headers['x-hyper-date'] is stamp
+
+    reference = AWS4Auth('access', 'secret', 'us-west-1', 'hyper', '20170101')
+    expected = reference(req.copy()).headers
+    fast = FastAWS4Auth('access', 'secret', 'us-west-1', 'hyper', '20170101')
+    monkeypatch.setattr(FastAWS4Auth, 'parse_date', None)
+    monkeypatch.setattr(fast_aws4auth, '_AMZ_DATE', None)
+    assert fast(req.copy()).headers == expected
+
+
+def test_hyper_date_cache_formats_once_per_second():
+    now = [1483272000.2]
+    cache = HyperDateCache(clock=lambda: now[0])
+    first = cache.now()
+    now[0] = 1483272000.9
+    assert cache.now() is first
+    now[0] = 1483272001.0
+    assert cache.now() == '20170101T120001Z'
+    assert cache.now(offset=-1.0) is first
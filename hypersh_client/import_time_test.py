@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+
+# cumulative microseconds `import hypersh_client` may take
+IMPORT_BUDGET_US = 20000
+
+HEAVY_MODULES = ('requests', 'aiohttp', 'hypersh_client.main.hypersh', 'hypersh_client.aws4auth2.aws4auth_hypersh')
+
+
+def _importtime(statement):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=root, stderr=subprocess.PIPE, universal_newlines=True, check=True,
+    )
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative_us, module = line[len('import time:'):].split('|')
+        if cumulative_us.strip().isdigit():
+            cumulative[module.strip()] = int(cumulative_us)
+    return cumulative
+
+
+def test_package_import_is_lazy_and_within_budget():
+    cumulative = _importtime('import hypersh_client')
+    assert 'hypersh_client' in cumulative
+    assert not [name for name in HEAVY_MODULES if name in cumulative]
+    assert cumulative['hypersh_client'] < IMPORT_BUDGET_US
+
+
+def test_client_loads_on_first_use():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    loaded = subprocess.check_output(
+        [sys.executable, '-c', 'import sys, hypersh_client; hypersh_client.HypershClient; print(" ".join(sys.modules))'],
+        cwd=root, universal_newlines=True,
+    ).split()
+    assert 'hypersh_client.main.hypersh' in loaded
+    assert 'hypersh_client.aws4auth2.six' not in loaded
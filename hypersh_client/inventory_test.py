@@ -0,0 +1,95 @@
+import threading
+import time
+
+from hypersh_client.main.containers import Container, ContainerSet
+from hypersh_client.main.inventory import Inventory
+
+
+class StubClient(object):
+    hyper_endpoint = 'http://stub'
+
+    def __init__(self, containers, streams=()):
+        self.containers = containers
+        # each iter_events call plays the next stream: a list of events, then
+        # the exception to raise, if any; once they run out it blocks
+        self.streams = list(streams)
+        self.since = []
+        self.idle = threading.Event()
+
+    def get_containers(self, as_records=False):
+        return True, ContainerSet(self.containers)
+
+    def iter_events(self, since=None, filters=None):
+        self.since.append(since)
+        if not self.streams:
+            self.idle.wait()
+            return
+        events, error = self.streams.pop(0)
+        for event in events:
+            yield event
+        if error is not None:
+            raise error
+
+
+def _event(action, container_id, time_nano=None, **attributes):
+    event = {'Type': 'container', 'Action': action, 'id': container_id,
+             'Actor': {'ID': container_id, 'Attributes': attributes}}
+    if time_nano is not None:
+        event['timeNano'] = time_nano
+    return event
+
+
+def test_events_update_every_index():
+    client = StubClient([Container('c1', 'hub', 'running', 'selenium/hub')])
+    inventory = Inventory(client)
+    assert inventory.resync()
+
+    inventory.apply_event(_event('create', 'c2', name='node', image='selenium/node'))
+    assert inventory.get('c2').state == 'created'
+    inventory.apply_event(_event('start', 'c2', name='node', image='selenium/node'))
+    assert [c.id for c in inventory.with_state('running')] == ['c1', 'c2']
+    assert inventory.get_by_name('node').image == 'selenium/node'
+
+    inventory.apply_event(_event('die', 'c1'))
+    assert [c.id for c in inventory.with_state('running')] == ['c2']
+    assert [c.id for c in inventory.with_state('exited')] == ['c1']
+
+    inventory.apply_event(_event('destroy', 'c1'))
+    assert 'c1' not in inventory
+    assert inventory.with_image('selenium/hub') == []
+    assert inventory.get_by_name('hub') is None
+
+
+def test_resync_corrects_drift():
+    client = StubClient([Container('c1', 'hub', 'running', 'selenium/hub')])
+    inventory = Inventory(client)
+    inventory.resync()
+    # a missed destroy and a missed create
+    client.containers = [Container('c2', 'node', 'running', 'selenium/node')]
+    inventory.resync()
+    assert [c.id for c in inventory.containers()] == ['c2']
+    assert inventory.stats()['drift_corrections'] == 2
+
+
+def test_event_thread_survives_stream_errors():
+    client = StubClient([], streams=[
+        ([_event('create', 'c1', 1500000000 * 10 ** 9, name='hub', image='selenium/hub')], Exception('GET /events failed')),
+        ([_event('start', 'c1', 1500000001 * 10 ** 9)], None),
+    ])
+    inventory = Inventory(client)
+    inventory.follow_backoff = 0.01
+    inventory.start()
+    try:
+        deadline = time.time() + 5
+        while len(client.since) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        assert inventory.get('c1').state == 'running'
+        # followed again from the last applied event each time
+        assert client.since[1:] == ['1500000000.000000000', '1500000001.000000000']
+        stats = inventory.stats()
+        assert stats['following']
+        assert stats['follow_errors'] == 2
+        assert stats['last_follow_error'] == 'event stream ended'
+    finally:
+        inventory.stop()
+        client.idle.set()
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from hypersh_client.conftest import StandInHandler
+from hypersh_client.main.hypersh import HypershClient
+from hypersh_client.main.streaming import iter_json_array
+
+
+RECORDS = [
+    {'Id': 'c1', 'Names': ['/hub'], 'State': 'running', 'Image': 'selenium/hub',
+     'Labels': {'role': 'hub'}, 'Created': 1500000000, 'Status': 'Up 2 hours'},
+    {'Id': 'c2', 'Names': ['/nœud-été'], 'State': 'running', 'Image': 'selenium/node',
+     'Labels': {'role': 'node', 'note': 'quote " and \\ backslash'}, 'Created': 1500000001.5},
+    {'Id': 'c3', 'Names': ['/node-2'], 'State': 'exited', 'Image': 'selenium/node',
+     'Labels': {}, 'Created': -12.25e3, 'Command': '/opt/bin/entry_point.sh'},
+]
+BODY = json.dumps(RECORDS, ensure_ascii=False, indent=1).encode('utf-8')
+
+
+def _pieces(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 64, len(BODY)])
+def test_json_array_split_anywhere(size):
+    assert list(iter_json_array(_pieces(BODY, size))) == RECORDS
+
+
+def test_json_array_split_at_every_offset():
+    # covers cuts inside strings, numbers, escapes and multi-byte characters
+    for cut in range(1, len(BODY)):
+        assert list(iter_json_array([BODY[:cut], BODY[cut:]])) == RECORDS, cut
+
+
+def test_json_array_scalars_and_empty():
+    assert list(iter_json_array([b'[1', b'2.', b'5, -3e', b'1,"a', b'b"', b', true]'])) == [12.5, -30.0, 'ab', True]
+    assert list(iter_json_array([b' [ ', b' ]'])) == []
+
+
+@pytest.mark.parametrize('body', [BODY[:-1], BODY[:len(BODY) // 2], b'', b'[1, 2', b'[{"Id": "c1"}'])
+def test_json_array_truncated_body_raises(body):
+    with pytest.raises(ValueError):
+        list(iter_json_array(_pieces(body, 5)))
+
+
+@pytest.mark.parametrize('body', [
+    b'{"message": "not an array"}', b'"c1"', b'[1 2]', b'[1,,2]', b'[,1]', b'[1,]', b'[{"Id": "c1"} {}]',
+])
+def test_json_array_rejects_other_documents(body):
+    with pytest.raises(ValueError):
+        list(iter_json_array([body]))
+
+
+class ListingHandler(StandInHandler):
+    """Sends server.body in chunks of server.piece bytes with server.status."""
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        self.send_response(self.server.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for piece in _pieces(self.server.body, self.server.piece):
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(piece), piece))
+        self.wfile.write(b'0\r\n\r\n')
+
+
+@pytest.fixture
+def client(stand_in_server):
+    server = stand_in_server(ListingHandler, paths=[], status=200, body=BODY, piece=3)
+    client = HypershClient('us-west-1', access_key='access', secret='secret')
+    client.hyper_endpoint = server.endpoint
+    client.server = server
+    return client
+
+
+@pytest.mark.parametrize('chunk_size', [1, 4, 1024])
+def test_streamed_listing_is_filtered_and_projected(client, chunk_size):
+    containers = list(client.iter_containers(image='selenium/node', chunk_size=chunk_size))
+    assert containers == [
+        {'id': 'c2', 'name': 'nœud-été', 'state': 'running', 'image': 'selenium/node'},
+        {'id': 'c3', 'name': 'node-2', 'state': 'exited', 'image': 'selenium/node'},
+    ]
+    assert list(client.iter_containers(state='running', labels={'role': 'node'}, fields=('id', 'labels', 'created'),
+                                       chunk_size=chunk_size)) == [
+        {'id': 'c2', 'labels': RECORDS[1]['Labels'], 'created': 1500000001.5}]
+    assert list(client.iter_containers(fields=('command', 'status'), chunk_size=chunk_size)) == [
+        {'command': None, 'status': 'Up 2 hours'}, {'command': None, 'status': None},
+        {'command': '/opt/bin/entry_point.sh', 'status': None}]
+    # the filters are also pushed to the server
+    assert 'filters=' in client.server.paths[0]
+
+
+def test_streamed_listing_as_records(client):
+    records = list(client.iter_containers(name='hub', as_records=True))
+    assert [(c.id, c.name, c.labels) for c in records] == [('c1', 'hub', {'role': 'hub'})]
+
+
+def test_truncated_streamed_listing_raises(client):
+    client.server.body = BODY[:-40]
+    listing = client.iter_containers(chunk_size=16)
+    assert next(listing)['id'] == 'c1'
+    with pytest.raises(ValueError):
+        list(listing)
+
+    client.server.body = b'{"message": "no such filter"}'
+    with pytest.raises(ValueError):
+        list(client.iter_containers())
+
+
+def test_failed_streamed_listing_raises(client):
+    client.server.status = 400
+    client.server.body = b'{"message": "invalid filter"}'
+    with pytest.raises(Exception) as raised:
+        list(client.iter_containers(state='running'))
+    assert 'status: 400' in str(raised.value)
+    assert 'invalid filter' in str(raised.value)
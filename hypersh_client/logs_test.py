@@ -0,0 +1,104 @@
+import io
+import struct
+import tempfile
+
+import pytest
+
+from hypersh_client.conftest import StandInHandler
+from hypersh_client.main.hypersh import HypershClient
+from hypersh_client.main.streaming import STDERR, STDOUT, iter_frames
+
+
+def _frame(stream, payload):
+    return struct.pack('>BxxxI', stream, len(payload)) + payload
+
+
+class Trickle(io.RawIOBase):
+    """Hands out at most `step` bytes per readinto, like a slow socket."""
+
+    def __init__(self, data, step):
+        self.data = memoryview(data)
+        self.step = step
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self.step, len(self.data))
+        b[:n] = self.data[:n]
+        self.data = self.data[n:]
+        return n
+
+
+def _collect(frames):
+    out = {STDOUT: b'', STDERR: b''}
+    for stream, data in frames:
+        assert isinstance(data, memoryview)
+        out[stream] += bytes(data)
+    return out
+
+
+STREAM = _frame(STDOUT, b'hello\n') + _frame(STDERR, b'oops\n') + _frame(STDOUT, b'x' * 100000)
+
+
+@pytest.mark.parametrize('step', [1, 7, 4096, len(STREAM)])
+def test_frames_split_anywhere_are_demultiplexed(step):
+    out = _collect(iter_frames(Trickle(STREAM, step), buffer_size=1024))
+    assert out == {STDOUT: b'hello\n' + b'x' * 100000, STDERR: b'oops\n'}
+
+
+def test_large_frames_come_out_in_buffer_sized_pieces():
+    sizes = [len(data) for _, data in iter_frames(io.BytesIO(_frame(STDOUT, b'y' * 2500)), buffer_size=1024)]
+    assert sizes == [1024, 1024, 452]
+
+
+def test_tty_output_is_passed_through():
+    out = _collect(iter_frames(io.BytesIO(b'plain tty output\n'), buffer_size=4))
+    assert out[STDOUT] == b'plain tty output\n'
+
+
+def test_truncated_frame_raises():
+    with pytest.raises(ValueError):
+        list(iter_frames(io.BytesIO(STREAM[:20])))
+
+
+class LogsHandler(StandInHandler):
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        self.send_response(200)
+        self.send_header('Content-Type', self.server.content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for start in range(0, len(STREAM), 3001):
+            piece = STREAM[start:start + 3001]
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(piece), piece))
+        self.wfile.write(b'0\r\n\r\n')
+
+
+@pytest.fixture
+def logs_server(stand_in_server):
+    return stand_in_server(LogsHandler, paths=[], content_type='application/vnd.docker.multiplexed-stream')
+
+
+def test_write_logs_goes_straight_to_file_descriptors(logs_server):
+    client = HypershClient('us-west-1', access_key='access', secret='secret')
+    client.hyper_endpoint = logs_server.endpoint
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        written = client.write_logs('c1', out, stderr_fd=err, follow=False, tail=100)
+        assert written == len(b'hello\n') + len(b'oops\n') + 100000
+        out.seek(0)
+        err.seek(0)
+        assert out.read() == b'hello\n' + b'x' * 100000
+        assert err.read() == b'oops\n'
+    assert logs_server.paths == ['/v1.23/containers/c1/logs?follow=0&stdout=1&stderr=1&tail=100']
+
+
+def test_framed_logs_labelled_raw_stream_are_demultiplexed(logs_server):
+    # daemons before API 1.42 label framed output raw-stream too
+    logs_server.content_type = 'application/vnd.docker.raw-stream'
+    client = HypershClient('us-west-1', access_key='access', secret='secret')
+    client.hyper_endpoint = logs_server.endpoint
+    chunks = [(stream, bytes(data)) for stream, data in client.stream_logs('c1', follow=False)]
+    assert b''.join(data for stream, data in chunks if stream == STDOUT) == b'hello\n' + b'x' * 100000
+    assert b''.join(data for stream, data in chunks if stream == STDERR) == b'oops\n'
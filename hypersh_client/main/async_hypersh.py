@@ -0,0 +1,166 @@
+#!/usr/bin/python
+
+import asyncio
+import json
+import time
+
+import requests
+
+try:
+    import aiohttp
+    import yarl
+except ImportError:  # pip install hypersh-client[async]
+    aiohttp = None
+
+from ..aws4auth2.fast_aws4auth import FastAWS4Auth
+from .clockskew import clock_skew_for
+from .containers import Container, ContainerSet
+from .credentials import default_credentials
+from .hypersh import (
+    ENPOINTS, HypershClient, _summarise_container, _create_container_request,
+    _container_matches, _containers_query,
+)
+
+
+class AsyncHypershClient(object):
+    """
+    asyncio counterpart of HypershClient. Every public method is a coroutine
+    returning the same values as its blocking twin. Requests are signed with
+    the same AWS4Auth logic and sent over a single aiohttp connection pool
+    owned by the client, so create one client per region and share it.
+    """
+
+    def __init__(self, region, max_connections=100, max_connections_per_host=0, access_key=None, secret=None,
+                 credentials=None):
+
+        if aiohttp is None:
+            raise Exception('AsyncHypershClient requires aiohttp: pip install hypersh-client[async]')
+        if region not in ('eu-central-1', 'us-west-1'):
+            raise Exception('invalid region: %s' % region)
+
+        self.region = region
+        self.hyper_endpoint = ENPOINTS[region]
+        self.credentials = credentials or default_credentials(access_key, secret, region=region)
+        self.hyper_auth = FastAWS4Auth(None, None, region, "hyper", credentials=self.credentials)
+        self.clock_skew = clock_skew_for(region)
+        self.hyper_auth.clock_skew = self.clock_skew
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        # created lazily so the pool is bound to the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections, limit_per_host=self.max_connections_per_host
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _sign(self, method, path, json=None, clock_offset=0.0):
+        prepared = requests.Request(
+            method, self.hyper_endpoint + path, json=json, headers=HypershClient._get_headers(clock_offset)
+        ).prepare()
+        self.hyper_auth(prepared)
+        return prepared
+
+    async def _request(self, method, path, json=None):
+        # same clock skew handling as HypershClient._request
+        resigned = False
+        while True:
+            clock_offset = self.clock_skew.offset
+            prepared = self._sign(method, path, json=json, clock_offset=clock_offset)
+            sent_at = time.time()
+            # the url is already quoted exactly as it was signed, stop yarl re-encoding it
+            async with self._get_session().request(
+                method, yarl.URL(prepared.url, encoded=True),
+                headers=dict(prepared.headers), data=prepared.body
+            ) as resp:
+                content = await resp.read()
+                received_at = time.time()
+                date_header = resp.headers.get('Date')
+                if resp.status == 403 and not resigned and self.clock_skew.correct(
+                        date_header, sent_at, received_at, clock_offset, content.decode('utf-8', 'replace')):
+                    resigned = True
+                    continue
+                self.clock_skew.observe(date_header, sent_at, received_at)
+                return resp.status, content
+
+    async def get_containers(self, state=None, image=None, name=None, labels=None, limit=None, since=None, before=None,
+                             as_records=False):
+        status, content = await self._request(
+            'GET', '/containers/json' + _containers_query(state, image, name, labels, limit, since, before)
+        )
+        if status not in (200, 201):
+            print('GET /containers/ failed, status: %s  -  %s' % (status, content.decode()))
+            return False, None
+
+        records = [di for di in json.loads(content.decode()) if _container_matches(di, state, image, name, labels)]
+        if as_records:
+            return True, ContainerSet(Container.from_api(di) for di in records)
+        containers = [_summarise_container(di) for di in records]
+        return True, containers
+
+    async def remove_all_containers_with_image(self, image):
+        success, containers = await self.get_containers(image=image)
+        if not success:
+            return False
+        results = await asyncio.gather(*[self.remove_container(di['id']) for di in containers])
+        for di, success in zip(containers, results):
+            if not success:
+                print('warning: failed to remove container ' + di['id'])
+        return True
+
+    async def remove_container(self, container_id):
+        status, _ = await self._request('DELETE', ('/containers/%s' % container_id) + '?v=1&force=1')
+        if status not in (200, 201):
+            return False
+        return True
+
+    async def create_container(self, image, name=None, size='M2', environment_variables=None, cmd=None, tcp_ports=None):
+
+        query_str, post_dict = _create_container_request(image, name, size, environment_variables, cmd, tcp_ports)
+
+        status, content = await self._request('POST', '/containers/create' + query_str, json=post_dict)
+        if status not in (200, 201, 204, 304):
+            print('/containers/create failed, status: %s  -  %s' % (status, content.decode()))
+            return False, None
+        container_id = json.loads(content.decode())['Id']
+        success = await self._start_container(container_id)
+        return success, container_id
+
+    async def _start_container(self, container_id):
+        status, content = await self._request('POST', '/containers/%s/start' % container_id)
+        # 204 = no error, 304 = container already started
+        if status not in (200, 201, 204, 304):
+            print('/containers/%s/start failed: %s' % (container_id, content.decode()))
+        return status in (200, 201, 204, 304)
+
+    async def get_fips(self):
+        status, content = await self._request('GET', '/fips')
+        if status not in (200, 201):
+            return False, None
+        fips = [di['fip'] for di in json.loads(content.decode())]
+        return True, fips
+
+    async def attach_fip(self, container_id, fip):
+        status, _ = await self._request(
+            'POST', '/fips/attach?ip=%(fip)s&container=%(container_id)s' % {
+                'fip': fip,
+                'container_id': container_id
+            }
+        )
+        if status not in (200, 201):
+            return False
+        return True
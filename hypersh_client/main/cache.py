@@ -0,0 +1,99 @@
+import threading
+import time
+
+
+class InventoryCache(object):
+    """
+    In-memory copy of the account's container and fip listings, valid for ttl
+    seconds after each full fetch. HypershClient serves reads from it while it
+    is fresh and writes its own mutations through to it, so a create followed
+    by a listing sees the new container without another round trip.
+
+    Containers are held as the raw /containers/json records so the usual
+    filters can be applied locally.
+    """
+
+    def __init__(self, ttl, clock=time.time):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._containers = None
+        self._containers_fetched = None
+        self._fips = None
+        self._fips_fetched = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _fresh(self, fetched):
+        return fetched is not None and self._clock() - fetched < self.ttl
+
+    def get_containers(self, count_miss=True):
+        # callers that won't fill the cache after a miss pass count_miss=False,
+        # so hit_ratio only reflects lookups the cache could have served
+        with self._lock:
+            if self._containers is not None and self._fresh(self._containers_fetched):
+                self.hits += 1
+                return list(self._containers.values())
+            if count_miss:
+                self.misses += 1
+            return None
+
+    def set_containers(self, records):
+        with self._lock:
+            self._containers = dict((di['Id'], di) for di in records)
+            self._containers_fetched = self._clock()
+
+    def put_container(self, record):
+        with self._lock:
+            if self._containers is not None:
+                self._containers[record['Id']] = record
+
+    def update_container(self, container_id, **fields):
+        with self._lock:
+            if self._containers is not None and container_id in self._containers:
+                record = dict(self._containers[container_id])
+                record.update(fields)
+                self._containers[container_id] = record
+
+    def discard_container(self, container_id):
+        with self._lock:
+            if self._containers is not None:
+                self._containers.pop(container_id, None)
+
+    def get_fips(self):
+        with self._lock:
+            if self._fips is not None and self._fresh(self._fips_fetched):
+                self.hits += 1
+                return [dict(di) for di in self._fips]
+            self.misses += 1
+            return None
+
+    def set_fips(self, records):
+        with self._lock:
+            self._fips = [dict(di) for di in records]
+            self._fips_fetched = self._clock()
+
+    def attach_fip(self, fip, container_id):
+        with self._lock:
+            for di in self._fips or []:
+                if di.get('fip') == fip:
+                    di['container'] = container_id
+
+    def invalidate(self):
+        with self._lock:
+            self._containers = self._containers_fetched = None
+            self._fips = self._fips_fetched = None
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': float(self.hits) / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'containers': len(self._containers) if self._containers is not None else 0,
+            }
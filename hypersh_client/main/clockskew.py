@@ -0,0 +1,96 @@
+import email.utils
+import re
+import threading
+
+
+# wording of signature rejections caused by the request date
+_CLOCK_ERROR = re.compile(r'(?i)skew|expired|not yet (?:current|valid)|too (?:old|far)|\bdate\b|\btime\b')
+
+
+def _parse_http_date(value):
+    parsed = email.utils.parsedate_tz(value) if value else None
+    if parsed is None:
+        return None
+    return float(email.utils.mktime_tz(parsed))
+
+
+class ClockSkew(object):
+    """
+    Smoothed estimate of how far the server's clock is ahead of ours, in
+    seconds, learned from the Date header of every response. HypershClient
+    adds it to the local time when stamping x-hyper-date, so a host whose
+    clock drifts keeps signing requests the server accepts.
+
+    Date has one second resolution and is stamped somewhere between sending
+    the request and receiving the response, so each sample is noisy by up to
+    half a second plus half the round trip; an exponentially weighted
+    average (smoothing is the weight of a new sample) evens that out.
+    """
+
+    # how far the estimate must move for a rejected request to be worth re-signing
+    resign_threshold = 5.0
+
+    def __init__(self, smoothing=0.2):
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self.offset = 0.0
+        self.samples = 0
+        self.corrections = 0
+        self._last_date = (None, None)
+
+    def measure(self, date_header, sent_at, received_at):
+        """One offset sample from a response, or None without a usable Date."""
+        last_header, server_time = self._last_date
+        if date_header != last_header:
+            server_time = _parse_http_date(date_header)
+            self._last_date = (date_header, server_time)
+        if server_time is None:
+            return None
+        return server_time + 0.5 - (sent_at + received_at) / 2.0
+
+    def observe(self, date_header, sent_at, received_at):
+        sample = self.measure(date_header, sent_at, received_at)
+        if sample is None:
+            return
+        with self._lock:
+            if self.samples == 0:
+                self.offset = sample
+            else:
+                self.offset += self.smoothing * (sample - self.offset)
+            self.samples += 1
+
+    def correct(self, date_header, sent_at, received_at, used_offset, message):
+        """
+        Called with a 403 response. If it looks like the server rejected the
+        request's date -- the error says so, or the Date header shows our
+        estimate was well off -- jump straight to the offset this response
+        implies and return True: signing again now should succeed.
+        """
+        sample = self.measure(date_header, sent_at, received_at)
+        if sample is None:
+            return False
+        moved = abs(sample - used_offset)
+        if moved < self.resign_threshold and not _CLOCK_ERROR.search(message or ''):
+            return False
+        with self._lock:
+            self.offset = sample
+            self.samples = max(self.samples, 1)
+            self.corrections += 1
+        return moved >= 1.0
+
+    def stats(self):
+        with self._lock:
+            return {'offset': self.offset, 'samples': self.samples, 'corrections': self.corrections}
+
+
+_region_skews = {}
+_region_skews_lock = threading.Lock()
+
+
+def clock_skew_for(region):
+    """The ClockSkew shared by every client of region in this process."""
+    with _region_skews_lock:
+        skew = _region_skews.get(region)
+        if skew is None:
+            skew = _region_skews[region] = ClockSkew()
+        return skew
@@ -0,0 +1,115 @@
+import sys
+
+
+class Container(object):
+    """
+    Compact container record. Uses __slots__ instead of a per-instance dict,
+    and interns the image and state strings, which repeat across the fleet.
+    """
+
+    __slots__ = ('id', 'name', 'state', 'image', 'labels')
+
+    def __init__(self, id, name, state, image, labels=None):
+        self.id = id
+        self.name = name
+        self.state = sys.intern(state) if state else state
+        self.image = sys.intern(image) if image else image
+        self.labels = labels or None
+
+    @classmethod
+    def from_api(cls, di):
+        """Build from a raw /containers/json record."""
+        names = di.get('Names') or []
+        return cls(di['Id'], names[0].lstrip('/') if names else None, di.get('State'), di.get('Image'), di.get('Labels'))
+
+    def as_dict(self):
+        """The plain dict form returned by HypershClient.get_containers."""
+        return {'id': self.id, 'name': self.name, 'state': self.state, 'image': self.image}
+
+    def __eq__(self, other):
+        if not isinstance(other, Container):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'Container(id=%r, name=%r, state=%r, image=%r)' % (self.id, self.name, self.state, self.image)
+
+
+class ContainerSet(object):
+    """
+    Collection of Container records indexed by id and name (O(1) lookup) and
+    grouped by image and state. Adding a record whose id is already present
+    replaces it and keeps every index consistent.
+    """
+
+    def __init__(self, containers=()):
+        self._by_id = {}
+        self._by_name = {}
+        self._by_image = {}
+        self._by_state = {}
+        for container in containers:
+            self.add(container)
+
+    def add(self, container):
+        self.discard(container.id)
+        self._by_id[container.id] = container
+        if container.name:
+            self._by_name[container.name] = container
+        self._by_image.setdefault(container.image, {})[container.id] = container
+        self._by_state.setdefault(container.state, {})[container.id] = container
+
+    def discard(self, container_id):
+        container = self._by_id.pop(container_id, None)
+        if container is None:
+            return None
+        if container.name and self._by_name.get(container.name) is container:
+            del self._by_name[container.name]
+        for index, key in ((self._by_image, container.image), (self._by_state, container.state)):
+            group = index.get(key)
+            if group is not None:
+                group.pop(container_id, None)
+                if not group:
+                    del index[key]
+        return container
+
+    def get(self, container_id, default=None):
+        return self._by_id.get(container_id, default)
+
+    def get_by_name(self, name, default=None):
+        return self._by_name.get(name, default)
+
+    def with_image(self, image):
+        return list(self._by_image.get(image, {}).values())
+
+    def with_state(self, state):
+        return list(self._by_state.get(state, {}).values())
+
+    def images(self):
+        return list(self._by_image)
+
+    def states(self):
+        return list(self._by_state)
+
+    def ids(self):
+        return list(self._by_id)
+
+    def as_dicts(self):
+        return [container.as_dict() for container in self]
+
+    def __contains__(self, container_id):
+        return container_id in self._by_id
+
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __repr__(self):
+        return 'ContainerSet(%d containers)' % len(self)
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+
+
+class NoCredentialsError(Exception):
+    pass
+
+
+class Credentials(object):
+
+    __slots__ = ('access_id', 'secret_key', 'session_token', 'expires')
+
+    def __init__(self, access_id, secret_key, session_token=None, expires=None):
+        self.access_id = access_id
+        self.secret_key = secret_key
+        self.session_token = session_token
+        # epoch seconds, None for credentials that don't expire
+        self.expires = expires
+
+    def expired(self, now=None):
+        return self.expires is not None and (now or time.time()) >= self.expires
+
+    def __repr__(self):
+        return 'Credentials(access_id=%r)' % self.access_id
+
+
+class StaticCredentials(object):
+    """Explicitly supplied access key and secret."""
+
+    def __init__(self, access_key, secret, session_token=None):
+        self._credentials = Credentials(access_key, secret, session_token) if access_key and secret else None
+
+    def load(self):
+        return self._credentials
+
+
+class EnvironmentCredentials(object):
+    """HYPERSH_ACCESS_KEY / HYPERSH_SECRET, read when first needed rather than at import."""
+
+    def __init__(self, access_key_var='HYPERSH_ACCESS_KEY', secret_var='HYPERSH_SECRET'):
+        self.access_key_var = access_key_var
+        self.secret_var = secret_var
+
+    def load(self):
+        access_key = os.environ.get(self.access_key_var)
+        secret = os.environ.get(self.secret_var)
+        if access_key and secret:
+            return Credentials(access_key, secret)
+        return None
+
+
+class ConfigFileCredentials(object):
+    """
+    The hyper CLI config file (~/.hyper/config.json, or $HYPERSH_CONFIG):
+
+        {"clouds": {"tcp://us-west-1.hyper.sh:443": {"accesskey": "...", "secretkey": "..."}}}
+
+    The cloud whose key mentions region is preferred, otherwise the first.
+    """
+
+    def __init__(self, path=None, region=None):
+        self.path = path or os.environ.get('HYPERSH_CONFIG') or os.path.join('~', '.hyper', 'config.json')
+        self.region = region
+
+    def load(self):
+        try:
+            with open(os.path.expanduser(self.path)) as f:
+                clouds = json.load(f).get('clouds') or {}
+        except (IOError, OSError, ValueError):
+            return None
+        names = sorted(clouds)
+        if self.region:
+            names.sort(key=lambda name: self.region not in name)
+        for name in names:
+            cloud = clouds[name]
+            if cloud.get('accesskey') and cloud.get('secretkey'):
+                return Credentials(cloud['accesskey'], cloud['secretkey'])
+        return None
+
+
+class CallbackCredentials(object):
+    """
+    Credentials from a callable, for vaults and other rotating sources.
+    callback() returns a Credentials (its expires is honoured), an
+    (access_key, secret) tuple, or None. Tuples are treated as expiring
+    after ttl seconds if ttl is given.
+    """
+
+    def __init__(self, callback, ttl=None):
+        self.callback = callback
+        self.ttl = ttl
+
+    def load(self):
+        result = self.callback()
+        if result is None or isinstance(result, Credentials):
+            return result
+        credentials = Credentials(*result)
+        if self.ttl is not None:
+            credentials.expires = time.time() + self.ttl
+        return credentials
+
+
+class CredentialChain(object):
+    """
+    Resolves credentials lazily from the first provider that has them and
+    caches the result until it expires or refresh() is called. get() is
+    cheap and thread-safe, and returns the same Credentials object until a
+    new one is resolved, so signers can detect rotation by identity.
+    """
+
+    def __init__(self, providers):
+        self.providers = list(providers)
+        self._lock = threading.Lock()
+        self._credentials = None
+
+    def get(self):
+        credentials = self._credentials
+        if credentials is not None and not credentials.expired():
+            return credentials
+        with self._lock:
+            if self._credentials is None or self._credentials.expired():
+                self._credentials = self._resolve()
+            return self._credentials
+
+    def refresh(self):
+        with self._lock:
+            self._credentials = self._resolve()
+            return self._credentials
+
+    def _resolve(self):
+        for provider in self.providers:
+            credentials = provider.load()
+            if credentials is not None:
+                return credentials
+        raise NoCredentialsError(
+            'no hyper.sh credentials: pass access_key/secret, set HYPERSH_ACCESS_KEY and '
+            'HYPERSH_SECRET, or configure ~/.hyper/config.json'
+        )
+
+
+def default_credentials(access_key=None, secret=None, region=None, config_path=None, callback=None, ttl=None):
+    """explicit arguments, then environment, then config file, then callback"""
+    providers = [StaticCredentials(access_key, secret), EnvironmentCredentials(), ConfigFileCredentials(config_path, region)]
+    if callback is not None:
+        providers.append(CallbackCredentials(callback, ttl))
+    return CredentialChain(providers)
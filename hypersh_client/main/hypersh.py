@@ -2,17 +2,30 @@
 
 #from requests_aws4auth import AWS4Auth
 import requests
-import datetime
+import json
+import re
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from uuid import uuid4
 
-#from hyper_sh.requests_aws4auth.aws4auth import AWS4Auth
-from ..aws4auth2.aws4auth_hypersh import AWS4Auth
-
+try:
+    from urllib.parse import quote
+except ImportError:
+    from urllib import quote
 
-ACCESS_KEY = os.environ['HYPERSH_ACCESS_KEY']
-SECRET = os.environ['HYPERSH_SECRET']
+#from hyper_sh.requests_aws4auth.aws4auth import AWS4Auth
+from ..aws4auth2.fast_aws4auth import FastAWS4Auth
+from ..aws4auth2.hyperdate import hyper_dates
+from .cache import InventoryCache
+from .clockskew import clock_skew_for
+from .containers import Container, ContainerSet
+from .credentials import default_credentials
+from .metrics import CountingReader, TimedAuth, route_name
+from .pool import PooledAdapter
+from .retry import CircuitBreaker, CircuitOpenError, RetryPolicy, is_failure
+from .singleflight import SingleFlight
+from .streaming import STDERR, STDOUT, iter_frames, iter_json_array, iter_ndjson
 
 
 ENPOINTS = {
@@ -20,99 +33,714 @@ ENPOINTS = {
     'eu-central-1': "https://eu-central-1.hyper.sh/v1.23",
 }
 
+# routes most traffic goes to, signed from precompiled templates, see RouteTemplate
+HOT_ROUTES = (
+    ('GET', '/containers/json?all=1'),
+    ('GET', '/fips'),
+    ('DELETE', '/containers/{id}?v=1&force=1'),
+    ('POST', '/containers/{id}/start'),
+    ('POST', '/containers/{id}/exec'),
+    ('GET', '/exec/{id}/json'),
+)
+
+
+def _container_name(di):
+    # None for a record without names, e.g. one the cache wrote for an unnamed create
+    names = di.get('Names') or []
+    return names[0].lstrip('/') if names else None
+
+
+def _summarise_container(di):
+    return {'id': di['Id'], 'name': _container_name(di), 'state': di['State'], 'image': di['Image']}
+
+
+CONTAINER_FIELDS = {
+    'id': lambda di: di['Id'],
+    'name': _container_name,
+    'state': lambda di: di['State'],
+    'image': lambda di: di['Image'],
+    'status': lambda di: di.get('Status'),
+    'created': lambda di: di.get('Created'),
+    'labels': lambda di: di.get('Labels') or {},
+    'command': lambda di: di.get('Command'),
+}
+
+
+def _create_container_request(image, name=None, size='M2', environment_variables=None, cmd=None, tcp_ports=None):
+
+    environment_variables = environment_variables or {}
+    tcp_ports = tcp_ports or []
+
+    query_str = ''
+    if name is not None:
+        query_str = '?name=' + name
+
+    post_dict = {'Image': image, 'Labels': {'sh_hyper_instancetype': size}}
+    if name:
+        post_dict['Hostname'] = name
+    if environment_variables:
+        post_dict['Env'] = [k + '=' + v.decode().strip() for (k, v) in environment_variables.items()]
+    if cmd:
+        post_dict['Cmd'] = cmd
+    if tcp_ports:
+        post_dict['HostConfig'] = {}
+        post_dict['HostConfig']['PortBindings'] = {"%s/tcp" % p: [{ "HostPort": str(p)}] for p in tcp_ports}
+    return query_str, post_dict
+
+
+def _container_matches(di, state=None, image=None, name=None, labels=None):
+    """
+    labels is a dict of label -> value; a value of None only requires the
+    label to be present.
+    """
+    if state and di['State'] != state:
+        return False
+    if image and di['Image'] != image:
+        return False
+    if name and name not in [n.lstrip('/') for n in di.get('Names') or []]:
+        return False
+    if labels:
+        container_labels = di.get('Labels') or {}
+        for key, value in labels.items():
+            if key not in container_labels or (value is not None and container_labels[key] != value):
+                return False
+    return True
+
+
+def _containers_query(state=None, image=None, name=None, labels=None, limit=None, since=None, before=None, ids=None):
+    """
+    Build the /containers/json querystring, pushing filters to the server as
+    Docker's filters= JSON. The JSON is compact and fully percent-encoded so
+    it canonicalizes identically in AWS4Auth.amz_cano_querystring, which
+    unquotes and truncates at the first space. Values that cannot survive that
+    round trip are rejected. Results should still go through
+    _container_matches, as the server treats name as a pattern and image as an
+    ancestor.
+    """
+    filters = {}
+    if state:
+        filters['status'] = [state]
+    if image:
+        filters['ancestor'] = [image]
+    if name:
+        filters['name'] = [name]
+    if labels:
+        filters['label'] = sorted(k if v is None else '%s=%s' % (k, v) for k, v in labels.items())
+    if ids:
+        filters['id'] = sorted(ids)
+
+    params = [('all', '1')]
+    if filters:
+        params.append(('filters', json.dumps(filters, separators=(',', ':'), sort_keys=True)))
+    for key, value in (('limit', limit), ('since', since), ('before', before)):
+        if value is not None:
+            params.append((key, str(value)))
+
+    return _encode_query(params)
+
+
+def _encode_query(params):
+    # every value fully percent-encoded, see _containers_query
+    for key, value in params:
+        if re.search(r'[\s&+#]', value):
+            raise ValueError('unsupported character in query parameter %s: %r' % (key, value))
+    return '?' + '&'.join('%s=%s' % (key, quote(value, safe='')) for key, value in params)
+
+
+def _events_query(since=None, until=None, filters=None):
+    params = []
+    for key, value in (('since', since), ('until', until)):
+        if value is not None:
+            params.append((key, str(value)))
+    if filters:
+        params.append(('filters', json.dumps(filters, separators=(',', ':'), sort_keys=True)))
+    return _encode_query(params) if params else ''
+
+
+def _logs_query(follow=True, stdout=True, stderr=True, since=None, tail=None, timestamps=False):
+    params = [('follow', str(int(follow))), ('stdout', str(int(stdout))), ('stderr', str(int(stderr)))]
+    if since is not None:
+        params.append(('since', str(since)))
+    if tail is not None:
+        params.append(('tail', str(tail)))
+    if timestamps:
+        params.append(('timestamps', '1'))
+    return _encode_query(params)
+
+
+def _framing_hint(resp):
+    # iter_frames' tty argument for a logs response: newer daemons label
+    # framed output multiplexed-stream; older ones send raw-stream for framed
+    # and TTY output alike, so None has iter_frames sniff those
+    if 'multiplexed-stream' in resp.headers.get('Content-Type', ''):
+        return False
+    return None
+
+
+def _write_all(fd, data):
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def _event_timestamp(event):
+    # the since= value that resumes at this event, at nanosecond precision
+    if event.get('timeNano'):
+        return '%d.%09d' % divmod(int(event['timeNano']), 10 ** 9)
+    return str(event.get('time'))
+
 
 class HypershClient(object):
 
-    def __init__(self, region):
+    def __init__(self, region, cache_ttl=None, coalesce=False, access_key=None, secret=None, credentials=None,
+                 pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True,
+                 retry_policy=None, circuit_breaker=None, metrics=None, clock_skew=None):
 
         if region not in ('eu-central-1', 'us-west-1'):
             raise Exception('invalid region: %s' % region)
 
+        self.region = region
         self.hyper_endpoint = ENPOINTS[region]
-        self.hyper_auth = AWS4Auth(ACCESS_KEY, SECRET, "us-west-1", "hyper")
+        # resolved on the first request, see default_credentials for the lookup order
+        self.credentials = credentials or default_credentials(access_key, secret, region=region)
+        self.hyper_auth = FastAWS4Auth(None, None, region, "hyper", credentials=self.credentials)
+        # server clock offset learned from response Date headers, see ClockSkew
+        self.clock_skew = clock_skew or clock_skew_for(region)
+        self.hyper_auth.clock_skew = self.clock_skew
+        for method, path in HOT_ROUTES:
+            self.hyper_auth.add_route(method, self.hyper_endpoint + path, self._get_headers())
         self.session = requests.Session()
+        # pool_maxsize should cover the threads sharing this client, see PooledAdapter
+        self.adapter = PooledAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+        # optional listing cache, see InventoryCache
+        self.cache = InventoryCache(cache_ttl) if cache_ttl else None
+        # concurrent identical reads share one request, see SingleFlight. Off
+        # by default: a listing can join one that started before this
+        # thread's own create or remove and so not reflect it
+        self.single_flight = SingleFlight() if coalesce else None
+        # pass RetryPolicy(max_attempts=1) to turn retries off
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        # e.g. MetricsRecorder(); None skips instrumentation entirely
+        self.metrics = metrics
+
+    def pool_stats(self):
+        return self.adapter.pool_stats()
+
+    def cache_stats(self):
+        if self.cache is None:
+            return None
+        return self.cache.stats()
+
+    def coalescing_stats(self):
+        if self.single_flight is None:
+            return None
+        return self.single_flight.stats()
+
+    def _coalesced(self, key, fn, *args):
+        if self.single_flight is None:
+            return fn(*args)
+        return self.single_flight.do(key, fn, *args)
+
+    def invalidate_cache(self):
+        if self.cache is not None:
+            self.cache.invalidate()
 
     @classmethod
-    def _get_headers(cls):
-        now = datetime.datetime.utcnow()
+    def _get_headers(cls, clock_offset=0.0):
         headers = {}
-        headers['x-hyper-date'] = now.strftime('%Y%m%dT%H%M%SZ')
+        # formatted once per second and read by the signer without parsing, see HyperDate
+        headers['x-hyper-date'] = hyper_dates.now(clock_offset)
         headers['content-type'] = 'application/json'
         return headers
 
-    def get_containers(self, state=None, image=None):
-        containers_list_resp = self.session.get(
-            self.hyper_endpoint + '/containers/json?all=1',
-            auth=self.hyper_auth, headers=self._get_headers()
+    def _request(self, method, path, **kwargs):
+        """
+        Send a signed request, retrying as retry_policy allows. Every attempt
+        gets fresh headers, so it is re-signed with a current x-hyper-date.
+        Raises CircuitOpenError without sending while the endpoint's circuit
+        breaker is open.
+
+        x-hyper-date is local time corrected by clock_skew. A 403 that looks
+        like the server rejected that date corrects the skew and is re-signed
+        and sent once more, without counting as a retry.
+        """
+        attempt = 0
+        resigned = False
+        while True:
+            if not self.circuit_breaker.allow():
+                raise CircuitOpenError('circuit open for %s, failing fast' % self.hyper_endpoint)
+            attempt += 1
+            clock_offset = self.clock_skew.offset
+            sent_at = time.time()
+            try:
+                if self.metrics is None:
+                    resp = self.session.request(
+                        method, self.hyper_endpoint + path,
+                        auth=self.hyper_auth, headers=self._get_headers(clock_offset), **kwargs
+                    )
+                else:
+                    resp = self._instrumented_request(method, path, self._get_headers(clock_offset), **kwargs)
+            except requests.RequestException as e:
+                self.circuit_breaker.record_failure()
+                if not self.retry_policy.should_retry(method, attempt, exc=e):
+                    raise
+                self.retry_policy.sleep(self.retry_policy.delay(attempt))
+                continue
+            except BaseException:
+                self.circuit_breaker.release()
+                raise
+            received_at = time.time()
+            # recorded before a re-sign too, so a half-open trial is settled
+            # rather than held while the request is sent again
+            if is_failure(resp):
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+
+            date_header = resp.headers.get('Date')
+            if resp.status_code == 403 and not resigned and self.clock_skew.correct(
+                    date_header, sent_at, received_at, clock_offset, resp.text):
+                resigned = True
+                attempt -= 1
+                resp.close()
+                continue
+            self.clock_skew.observe(date_header, sent_at, received_at)
+
+            if not self.retry_policy.should_retry(method, attempt, response=resp):
+                return resp
+            delay = self.retry_policy.delay(attempt, resp)
+            resp.close()
+            self.retry_policy.sleep(delay)
+
+    def _instrumented_request(self, method, path, headers, **kwargs):
+        """
+        session.request with the request observed by self.metrics. Latency is
+        the time until the response headers (and, unless streamed, the body)
+        arrived. A streamed response is observed when it is closed, with the
+        body bytes actually read by then, so a streamed response that is
+        never closed is never observed.
+        """
+        route = route_name(method, path)
+        auth = TimedAuth(self.hyper_auth)
+        started = time.perf_counter()
+        try:
+            resp = self.session.request(
+                method, self.hyper_endpoint + path,
+                auth=auth, headers=headers, **kwargs
+            )
+            bytes_in = None if kwargs.get('stream') else len(resp.content)
+        except BaseException:
+            self.metrics.observe(self.region, route, None, time.perf_counter() - started, auth.seconds, 0, 0)
+            raise
+        seconds = time.perf_counter() - started
+        bytes_out = len(resp.request.body or b'')
+        if bytes_in is not None:
+            self.metrics.observe(self.region, route, resp.status_code, seconds, auth.seconds, bytes_out, bytes_in)
+            return resp
+
+        resp.raw = reader = CountingReader(resp.raw)
+        close = resp.close
+        observed = []
+
+        def observing_close():
+            try:
+                close()
+            finally:
+                if not observed:
+                    observed.append(True)
+                    self.metrics.observe(
+                        self.region, route, resp.status_code, seconds, auth.seconds, bytes_out, reader.bytes_read
+                    )
+
+        resp.close = observing_close
+        return resp
+
+    def get_containers(self, state=None, image=None, name=None, labels=None, limit=None, since=None, before=None,
+                       as_records=False):
+        """
+        Returns (success, containers). containers is a list of dicts, or a
+        ContainerSet of compact Container records if as_records is set.
+        """
+        if self.cache is not None and limit is None and since is None and before is None:
+            # the cache holds the whole unfiltered listing and filters locally
+            records = self.cache.get_containers()
+            if records is None:
+                success, records = self._list_containers()
+                if not success:
+                    return False, None
+                self.cache.set_containers(records)
+        else:
+            success, records = self._list_containers(state, image, name, labels, limit, since, before)
+            if not success:
+                return False, None
+
+        if as_records:
+            return True, ContainerSet(
+                Container.from_api(di) for di in records if _container_matches(di, state, image, name, labels)
+            )
+        containers = [
+            _summarise_container(di) for di in records
+            if _container_matches(di, state, image, name, labels)
+        ]
+        return True, containers
+
+    def iter_containers(self, state=None, image=None, name=None, labels=None, limit=None, since=None, before=None,
+                        fields=('id', 'name', 'state', 'image'), chunk_size=64 * 1024, as_records=False):
+        """
+        Generator version of get_containers. The /containers/json body is
+        decoded one record at a time from the response stream and each record
+        is filtered and projected down to fields (keys of CONTAINER_FIELDS)
+        before the next is read, so memory does not grow with the fleet.
+        With as_records, Container records are yielded and fields is ignored.
+        """
+        if as_records:
+            project = Container.from_api
+        else:
+            getters = [(field, CONTAINER_FIELDS[field]) for field in fields]
+            project = lambda di: dict((field, getter(di)) for field, getter in getters)
+
+        records = None
+        if self.cache is not None and limit is None and since is None and before is None:
+            # a streamed, server-filtered listing can't fill the cache
+            records = self.cache.get_containers(count_miss=False)
+        if records is not None:
+            for di in records:
+                if _container_matches(di, state, image, name, labels):
+                    yield project(di)
+            return
+
+        containers_list_resp = self._request(
+            'GET', '/containers/json' + _containers_query(state, image, name, labels, limit, since, before), stream=True
         )
+        try:
+            if containers_list_resp.status_code not in (200, 201):
+                raise Exception('GET /containers/ failed, status: %s  -  %s' % (containers_list_resp.status_code, containers_list_resp.content.decode()))
+            for di in iter_json_array(containers_list_resp.iter_content(chunk_size)):
+                if _container_matches(di, state, image, name, labels):
+                    yield project(di)
+        finally:
+            containers_list_resp.close()
+
+    def _list_containers(self, state=None, image=None, name=None, labels=None, limit=None, since=None, before=None,
+                         ids=None):
+        path = '/containers/json' + _containers_query(state, image, name, labels, limit, since, before, ids)
+        return self._coalesced(('GET', path), self._fetch_containers, path)
+
+    def _fetch_containers(self, path):
+        containers_list_resp = self._request('GET', path)
         if containers_list_resp.status_code not in (200, 201):
             print('GET /containers/ failed, status: %s  -  %s' % (containers_list_resp.status_code, containers_list_resp.content.decode()))
             return False, None
+        return True, containers_list_resp.json()
 
-        containers = [di for di in containers_list_resp.json()]
+    def iter_events(self, since=None, until=None, filters=None, reconnect=True, max_reconnects=None, read_timeout=None):
+        """
+        Generator over the /events stream, yielding each event dict as soon
+        as its line arrives. filters is a Docker events filter dict, e.g.
+        {'type': ['container'], 'event': ['start', 'die']}.
 
-        if state:
-            containers = [di for di in containers if di['State'] == state]
-        if image:
-            containers = [di for di in containers if di['Image'] == image]
+        If the connection drops (or the server closes it while no until was
+        given), the stream reconnects after a backoff with since= set to the
+        timestamp of the last event, so nothing is missed. Events at that
+        exact timestamp that were already yielded are not yielded again.
+        Gives up after max_reconnects consecutive failures (None: never).
+        """
+        resume = since
+        seen = set()
+        failures = 0
+        while True:
+            path = '/events' + _events_query(resume, until, filters)
+            received = False
+            try:
+                events_resp = self._request('GET', path, stream=True, timeout=(30, read_timeout))
+                try:
+                    if events_resp.status_code not in (200, 201):
+                        raise Exception('GET /events failed, status: %s  -  %s' % (events_resp.status_code, events_resp.content.decode()))
+                    for event in iter_ndjson(events_resp.iter_content(chunk_size=None)):
+                        key = (event.get('timeNano') or event.get('time'), event.get('id'), event.get('Action') or event.get('status'))
+                        if key in seen:
+                            continue
+                        timestamp = _event_timestamp(event)
+                        if timestamp != resume:
+                            resume = timestamp
+                            seen = set()
+                        seen.add(key)
+                        received = True
+                        failures = 0
+                        yield event
+                finally:
+                    events_resp.close()
+            except (requests.RequestException, ValueError):
+                # ValueError: the connection dropped mid-line
+                if not reconnect:
+                    raise
+                failures += 1
+                if max_reconnects is not None and failures > max_reconnects:
+                    raise
+                self.retry_policy.sleep(self.retry_policy.delay(failures))
+                continue
+            if until is not None or not reconnect:
+                return
+            if not received:
+                # closed without sending anything, don't reconnect in a tight loop
+                failures += 1
+                if max_reconnects is not None and failures > max_reconnects:
+                    return
+                self.retry_policy.sleep(self.retry_policy.delay(failures))
 
-        containers = [
-            {'id': di['Id'], 'name': di['Names'][0].lstrip('/'), 'state': di['State'], 'image': di['Image']}
-            for di in containers
-        ]
-        return True, containers
+    def wait_for_state(self, container_ids, state='running', timeout=60, min_interval=0.25, max_interval=5.0):
+        """
+        Poll until every container in container_ids is in state, or timeout
+        seconds pass. Each poll is one listing call covering all containers
+        still pending. The interval starts at min_interval, grows by half
+        each poll without progress up to max_interval, and drops back to
+        min_interval whenever another container arrives.
+
+        Ids may be short prefixes, as Docker's id filter matches them too.
+        Returns (success, states): success is True if all of them reached
+        state, states maps each id as given to the last state seen (None if
+        the container was not listed).
+        """
+        states = dict((container_id, None) for container_id in container_ids)
+        pending = set(container_ids)
+        short_ids = [container_id for container_id in states if len(container_id) < 64]
+
+        def requested(full_id):
+            if full_id in states:
+                return full_id
+            for container_id in short_ids:
+                if full_id.startswith(container_id):
+                    return container_id
+            return None
+
+        deadline = time.time() + timeout
+        interval = min_interval
+        while pending:
+            # filtering by id keeps the response small; very large batches
+            # would make the querystring too long, so list everything instead
+            ids = pending if len(pending) <= 100 else None
+            success, records = self._list_containers(ids=ids)
+            if success:
+                arrived = 0
+                for di in records:
+                    container_id = requested(di['Id'])
+                    if container_id is not None:
+                        states[container_id] = di['State']
+                        if di['State'] == state and container_id in pending:
+                            pending.discard(container_id)
+                            arrived += 1
+                if self.cache is not None:
+                    for di in records:
+                        self.cache.update_container(di['Id'], State=di['State'])
+                interval = min_interval if arrived else min(max_interval, interval * 1.5)
+            if not pending:
+                break
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False, states
+            time.sleep(min(interval, remaining))
+        return True, states
+
+    def stream_logs(self, container_id, follow=True, stdout=True, stderr=True, since=None, tail=None,
+                    timestamps=False, buffer_size=64 * 1024, read_timeout=None):
+        """
+        Generator over a container's logs, yielding (stream, data) pairs as
+        they arrive, with stream 1 (stdout) or 2 (stderr). data is a
+        memoryview into a reusable buffer, valid until the next pair (see
+        streaming.iter_frames); memory use stays at buffer_size regardless of
+        how much is logged. tail=N starts from the last N lines instead of
+        the beginning; with follow=False the stream ends at the current end
+        of the log.
+        """
+        path = '/containers/%s/logs' % container_id + _logs_query(follow, stdout, stderr, since, tail, timestamps)
+        logs_resp = self._request('GET', path, stream=True, timeout=(30, read_timeout))
+        try:
+            if logs_resp.status_code != 200:
+                raise Exception('GET %s failed, status: %s  -  %s' % (path, logs_resp.status_code, logs_resp.content.decode()))
+            for stream, data in iter_frames(logs_resp.raw, buffer_size, tty=_framing_hint(logs_resp)):
+                yield stream, data
+        finally:
+            logs_resp.close()
+
+    def write_logs(self, container_id, fd, stderr_fd=None, **kwargs):
+        """
+        Copy a container's logs straight to a file descriptor (or anything
+        with fileno()), stderr to stderr_fd if given, without building
+        intermediate bytes objects. Takes stream_logs' keyword arguments and
+        returns the number of bytes written.
+        """
+        fd = fd if isinstance(fd, int) else fd.fileno()
+        if stderr_fd is None:
+            stderr_fd = fd
+        elif not isinstance(stderr_fd, int):
+            stderr_fd = stderr_fd.fileno()
+        written = 0
+        for stream, data in self.stream_logs(container_id, **kwargs):
+            _write_all(stderr_fd if stream == STDERR else fd, data)
+            written += len(data)
+        return written
+
+    def exec_create(self, container_id, cmd, environment_variables=None, tty=False, user=None, working_dir=None):
+        """
+        Create an exec instance running cmd (a list, or a string run with
+        /bin/sh -c) in a running container. Returns (success, exec_id).
+        """
+        if isinstance(cmd, str):
+            cmd = ['/bin/sh', '-c', cmd]
+        post_dict = {'AttachStdout': True, 'AttachStderr': True, 'Tty': tty, 'Cmd': list(cmd)}
+        if environment_variables:
+            post_dict['Env'] = ['%s=%s' % (key, value) for key, value in environment_variables.items()]
+        if user:
+            post_dict['User'] = user
+        if working_dir:
+            post_dict['WorkingDir'] = working_dir
+        create_resp = self._request('POST', '/containers/%s/exec' % container_id, json=post_dict)
+        if create_resp.status_code not in (200, 201):
+            print('/containers/%s/exec failed, status: %s  -  %s' % (container_id, create_resp.status_code, create_resp.content.decode()))
+            return False, None
+        return True, create_resp.json()['Id']
+
+    def exec_start(self, exec_id, tty=False, buffer_size=64 * 1024, read_timeout=None):
+        """
+        Start an exec instance and yield its output as (stream, data) pairs
+        while it runs, demultiplexed like stream_logs (data is a memoryview,
+        valid until the next pair). tty must match exec_create. The exit code
+        is available from exec_inspect once the iterator is exhausted.
+        """
+        start_resp = self._request(
+            'POST', '/exec/%s/start' % exec_id, json={'Detach': False, 'Tty': tty},
+            stream=True, timeout=(30, read_timeout),
+        )
+        try:
+            if start_resp.status_code not in (200, 201):
+                raise Exception('/exec/%s/start failed, status: %s  -  %s' % (exec_id, start_resp.status_code, start_resp.content.decode()))
+            for stream, data in iter_frames(start_resp.raw, buffer_size, tty=tty):
+                yield stream, data
+        finally:
+            start_resp.close()
 
-    def remove_all_containers_with_image(self, image):
-        success, containers = self.get_containers(image==image)
+    def exec_inspect(self, exec_id):
+        """Returns (success, info), info holding 'Running' and 'ExitCode' among others."""
+        inspect_resp = self._request('GET', '/exec/%s/json' % exec_id)
+        if inspect_resp.status_code not in (200, 201):
+            return False, None
+        return True, inspect_resp.json()
+
+    def exec_run(self, container_id, cmd, environment_variables=None, user=None, working_dir=None, read_timeout=None):
+        """
+        Run cmd in a container to completion and collect its output. Returns
+            {'container_id', 'exec_id', 'exit_code', 'stdout', 'stderr', 'error'}
+        with stdout and stderr as bytes. error is None unless the exec could
+        not be run or its exit code read.
+        """
+        result = {
+            'container_id': container_id, 'exec_id': None, 'exit_code': None,
+            'stdout': b'', 'stderr': b'', 'error': None,
+        }
+        try:
+            success, exec_id = self.exec_create(container_id, cmd, environment_variables, user=user, working_dir=working_dir)
+            if not success:
+                result['error'] = 'exec create failed in %s' % container_id
+                return result
+            result['exec_id'] = exec_id
+            output = {STDOUT: bytearray(), STDERR: bytearray()}
+            for stream, data in self.exec_start(exec_id, read_timeout=read_timeout):
+                output.get(stream, output[STDOUT]).extend(data)
+            result['stdout'], result['stderr'] = bytes(output[STDOUT]), bytes(output[STDERR])
+
+            # the stream can close a moment before the daemon records the exit code
+            for delay in (0, 0.05, 0.1, 0.2, 0.4, 0.8):
+                time.sleep(delay)
+                success, info = self.exec_inspect(exec_id)
+                if success and not info.get('Running'):
+                    result['exit_code'] = info.get('ExitCode')
+                    return result
+            result['error'] = 'could not read exit code of exec %s' % exec_id
+        except Exception as e:
+            result['error'] = '%s: %s' % (type(e).__name__, e)
+        return result
+
+    def exec_many(self, container_ids, cmd, max_concurrency=10, **kwargs):
+        """
+        exec_run cmd in every container at once, with at most max_concurrency
+        execs in flight, so a fleet-wide probe takes about as long as the
+        slowest single one. Takes exec_run's keyword arguments and returns
+        its result dicts in container_ids order.
+
+        All execs share the client's connection pool; give the client a
+        pool_maxsize of at least max_concurrency so none are opened and
+        thrown away.
+        """
+        if not container_ids:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(container_ids)))) as pool:
+            return list(pool.map(lambda container_id: self.exec_run(container_id, cmd, **kwargs), container_ids))
+
+    def remove_all_containers_with_image(self, image, max_concurrency=10, progress=None):
+        success, result = self.remove_all_containers(image=image, max_concurrency=max_concurrency, progress=progress)
         if not success:
             return False
-        for di in containers:
-            success = self.remove_container(di['id'])
-            if not success:
-                print('warning: failed to remove container ' + di['id'])
+        for container_id in result['failed']:
+            print('warning: failed to remove container ' + container_id)
         return True
 
+    def remove_all_containers(self, image=None, state=None, name=None, labels=None, max_concurrency=10, progress=None):
+        """
+        Remove every container matching the given filters (see get_containers)
+        concurrently. Returns (success, result) where success is False only if
+        the listing failed, and result is the aggregate from remove_containers.
+        """
+        success, containers = self.get_containers(state=state, image=image, name=name, labels=labels)
+        if not success:
+            return False, None
+        return True, self.remove_containers(
+            [di['id'] for di in containers], max_concurrency=max_concurrency, progress=progress
+        )
+
+    def remove_containers(self, container_ids, max_concurrency=10, progress=None):
+        """
+        Remove containers with at most max_concurrency deletes in flight.
+
+        progress, if given, is called from the calling thread after each
+        delete as progress(container_id, success, done, total).
+
+        Returns {'total': int, 'removed': [ids], 'failed': [ids]}.
+        """
+        result = {'total': len(container_ids), 'removed': [], 'failed': []}
+        if not container_ids:
+            return result
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(container_ids)))) as pool:
+            futures = {pool.submit(self.remove_container, container_id): container_id for container_id in container_ids}
+            for future in as_completed(futures):
+                container_id = futures[future]
+                try:
+                    success = future.result()
+                except requests.RequestException:
+                    success = False
+                result['removed' if success else 'failed'].append(container_id)
+                if progress is not None:
+                    progress(container_id, success, len(result['removed']) + len(result['failed']), result['total'])
+        return result
+
     def remove_container(self, container_id):
         # requests.post(
         #     hyper_endpoint + '/containers/%s/stop' % id,
         #     auth=hyper_auth, headers=get_headers()
         # )
-        delete_resp = self.session.delete(
-            self.hyper_endpoint + ('/containers/%s' % container_id) + '?v=1&force=1',
-            auth=self.hyper_auth, headers=self._get_headers()
-        )
+        delete_resp = self._request('DELETE', ('/containers/%s' % container_id) + '?v=1&force=1')
         if delete_resp.status_code not in (200, 201):
             return False
+        if self.cache is not None:
+            self.cache.discard_container(container_id)
         return True
 
     def create_container(self, image, name=None, size='M2', environment_variables=None, cmd=None, tcp_ports=None):
 
-        environment_variables = environment_variables or {}
-        tcp_ports = tcp_ports or []
-
-        query_str = ''
-        if name is not None:
-            query_str = '?name=' + name
-
-        post_dict = {'Image': image, 'Labels': {'sh_hyper_instancetype': size}}
-        if name:
-            post_dict['Hostname'] = name
-        if environment_variables:
-            post_dict['Env'] = [k + '=' + v.decode().strip() for (k, v) in environment_variables.items()]
-        if cmd:
-            post_dict['Cmd'] = cmd
-        if tcp_ports:
-            post_dict['HostConfig'] = {}
-            post_dict['HostConfig']['PortBindings'] = {"%s/tcp" % p: [{ "HostPort": str(p)}] for p in tcp_ports}
-
-        auth = self.hyper_auth
-        headers = self._get_headers()
-        
-        create_container_resp = self.session.post(
-            self.hyper_endpoint + '/containers/create' + query_str,
-            json=post_dict, # e.g. 'scrapinghub/splash'
-            auth=auth, headers=headers
-        )
+        create_container_resp = self._post_create(image, name, size, environment_variables, cmd, tcp_ports)
         if create_container_resp.status_code not in (200, 201, 204, 304):
             print('/containers/create failed, status: %s  -  %s' % (create_container_resp.status_code, create_container_resp.content.decode()))
             return False, None
@@ -121,35 +749,98 @@ class HypershClient(object):
         success = self._start_container(container_id)
         return success, container_id
 
-    def _start_container(self, container_id):  # not sure if this is necessary?
-        start_container_resp = self.session.post(
-            self.hyper_endpoint + '/containers/%s/start' % container_id,
-            auth=self.hyper_auth, headers=self._get_headers(),
+    def create_containers(self, specs, max_concurrency=10):
+        """
+        Create and start many containers at once. specs is a list of dicts of
+        create_container keyword arguments. Each spec is started as soon as its
+        own create returns, with at most max_concurrency specs in flight.
+
+        Returns one result dict per spec, in the same order:
+            {'spec', 'id', 'created', 'started', 'create_time', 'start_time', 'error'}
+        A failing spec records its error and does not affect the others.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            return list(pool.map(self._create_and_start, specs))
+
+    def _create_and_start(self, spec):
+        result = {
+            'spec': spec, 'id': None, 'created': False, 'started': False,
+            'create_time': None, 'start_time': None, 'error': None,
+        }
+        try:
+            started_at = time.time()
+            create_resp = self._post_create(**spec)
+            result['create_time'] = time.time() - started_at
+            if create_resp.status_code not in (200, 201, 204, 304):
+                result['error'] = '/containers/create failed, status: %s  -  %s' % (create_resp.status_code, create_resp.content.decode())
+                return result
+            result['id'] = create_resp.json()['Id']
+            result['created'] = True
+
+            started_at = time.time()
+            start_resp = self._post_start(result['id'])
+            result['start_time'] = time.time() - started_at
+            if start_resp.status_code not in (200, 201, 204, 304):
+                result['error'] = '/containers/%s/start failed: %s' % (result['id'], start_resp.content.decode())
+                return result
+            result['started'] = True
+        except Exception as e:
+            result['error'] = '%s: %s' % (type(e).__name__, e)
+        return result
+
+    def _post_create(self, image, name=None, size='M2', environment_variables=None, cmd=None, tcp_ports=None):
+        query_str, post_dict = _create_container_request(image, name, size, environment_variables, cmd, tcp_ports)
+        create_resp = self._request(
+            'POST', '/containers/create' + query_str,
+            json=post_dict, # e.g. 'scrapinghub/splash'
         )
+        if self.cache is not None and create_resp.status_code in (200, 201, 204, 304):
+            self.cache.put_container({
+                'Id': create_resp.json()['Id'], 'Names': ['/' + name] if name else [],
+                'State': 'created', 'Image': image, 'Labels': dict(post_dict['Labels']),
+            })
+        return create_resp
+
+    def _post_start(self, container_id):
+        start_resp = self._request('POST', '/containers/%s/start' % container_id)
+        if self.cache is not None and start_resp.status_code in (200, 201, 204, 304):
+            self.cache.update_container(container_id, State='running')
+        return start_resp
+
+    def _start_container(self, container_id):  # not sure if this is necessary?
+        start_container_resp = self._post_start(container_id)
         # 204 = no error, 304 = container already started
         if start_container_resp.status_code not in (200, 201, 204, 304):
             print('/containers/%s/start failed: %s' % (container_id, start_container_resp.content.decode()))
         return start_container_resp.status_code in (200, 201, 204, 304)
 
     def get_fips(self):
-        fips_resp = self.session.get(
-            self.hyper_endpoint + '/fips', auth=self.hyper_auth,
-            headers=self._get_headers()
-        )
+        records = self.cache.get_fips() if self.cache is not None else None
+        if records is None:
+            success, records = self._coalesced(('GET', '/fips'), self._fetch_fips)
+            if not success:
+                return False, None
+            if self.cache is not None:
+                self.cache.set_fips(records)
+        fips = [di['fip'] for di in records]
+        return True, fips
+
+    def _fetch_fips(self):
+        fips_resp = self._request('GET', '/fips')
         if fips_resp.status_code not in (200, 201):
             return False, None
-        fips = [di['fip'] for di in fips_resp.json()]
-        return True, fips
+        return True, fips_resp.json()
 
     def attach_fip(self, container_id, fip):
-        attach_resp = self.session.post(
-            self.hyper_endpoint + '/fips/attach?ip=%(fip)s&container=%(container_id)s' % {
+        attach_resp = self._request(
+            'POST', '/fips/attach?ip=%(fip)s&container=%(container_id)s' % {
                 'fip': fip,
                 'container_id': container_id
-            },
-            auth=self.hyper_auth, headers=self._get_headers()
+            }
         )
         if attach_resp.status_code not in (200, 201):
             return False
+        if self.cache is not None:
+            self.cache.attach_fip(fip, container_id)
         return True
 
@@ -0,0 +1,230 @@
+import threading
+import time
+
+from .containers import Container, ContainerSet
+from .hypersh import _event_timestamp
+
+
+# container event Action -> state the container is in afterwards
+EVENT_STATES = {
+    'create': 'created',
+    'start': 'running',
+    'restart': 'running',
+    'unpause': 'running',
+    'pause': 'paused',
+    'die': 'exited',
+    'stop': 'exited',
+    'oom': None,
+    'kill': None,
+}
+
+
+class Inventory(object):
+    """
+    Local, event-driven copy of a region's containers.
+
+    start() seeds it with one listing, then follows /events in a background
+    thread and applies create/start/die/destroy/... as they arrive. A second
+    thread re-lists every resync_interval seconds to correct any drift
+    (missed events, changes the event stream doesn't report). Queries are
+    answered from memory and never touch the API.
+
+    If the event stream fails for good (iter_events gives up, or raises
+    something it doesn't retry), the thread logs it, waits follow_backoff
+    seconds, doubling up to follow_backoff_max, and follows again from the
+    last event it applied. stats() reports whether it is currently
+    following and the last error.
+
+    apply_event() and resync() can also be driven by hand instead of start().
+    """
+
+    follow_backoff = 1.0
+    follow_backoff_max = 60.0
+
+    def __init__(self, client, resync_interval=300):
+        self.client = client
+        self.resync_interval = resync_interval
+        self._lock = threading.Lock()
+        self._containers = ContainerSet()
+        self._journal = None
+        self._stopping = threading.Event()
+        self._threads = []
+        self.events_applied = 0
+        self.resyncs = 0
+        self.drift_corrections = 0
+        self.last_resync = None
+        self.following = False
+        self.follow_errors = 0
+        self.last_follow_error = None
+
+    def start(self):
+        seeded_at = time.time()
+        success = self.resync()
+        if not success:
+            raise Exception('could not seed inventory from %s' % self.client.hyper_endpoint)
+        # replay from a little before the seed so nothing between the
+        # listing and the stream opening is missed; replays are idempotent
+        since = '%.9f' % (seeded_at - 1)
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._follow_events, args=(since,), name='hypersh-inventory-events'),
+            threading.Thread(target=self._resync_periodically, name='hypersh-inventory-resync'),
+        ]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop resyncing and applying events. The event thread is a daemon and
+        exits at its next event.
+        """
+        self._stopping.set()
+
+    def _follow_events(self, since):
+        try:
+            self._follow_events_until_stopped(since)
+        finally:
+            self.following = False
+
+    def _follow_events_until_stopped(self, since):
+        backoff = self.follow_backoff
+        while not self._stopping.is_set():
+            self.following = True
+            try:
+                for event in self.client.iter_events(since=since, filters={'type': ['container']}):
+                    if self._stopping.is_set():
+                        return
+                    self.apply_event(event)
+                    since = _event_timestamp(event)
+                    backoff = self.follow_backoff
+                error = 'event stream ended'
+            except Exception as e:
+                error = '%s: %s' % (type(e).__name__, e)
+            if self._stopping.is_set():
+                return
+            with self._lock:
+                self.following = False
+                self.follow_errors += 1
+                self.last_follow_error = error
+            print('warning: inventory stopped following events (%s), following again in %ss' % (error, backoff))
+            if self._stopping.wait(backoff):
+                return
+            backoff = min(backoff * 2, self.follow_backoff_max)
+
+    def _resync_periodically(self):
+        while not self._stopping.wait(self.resync_interval):
+            try:
+                self.resync()
+            except Exception as e:
+                print('warning: inventory resync failed: %s' % e)
+
+    def resync(self):
+        """Re-list everything and replace the local state. Returns success."""
+        with self._lock:
+            # events arriving while we list are journaled and replayed on
+            # top, so the listing can't roll them back
+            self._journal = []
+        try:
+            success, containers = self.client.get_containers(as_records=True)
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+        with self._lock:
+            journal, self._journal = self._journal, None
+            if not success:
+                return False
+            if self.last_resync is not None:
+                self.drift_corrections += self._count_drift(containers)
+            self._containers = containers
+            for event in journal:
+                self._apply(event)
+            self.resyncs += 1
+            self.last_resync = time.time()
+        return True
+
+    def _count_drift(self, fresh):
+        drift = len(set(self._containers.ids()) ^ set(fresh.ids()))
+        for container in fresh:
+            current = self._containers.get(container.id)
+            if current is not None and current.state != container.state:
+                drift += 1
+        return drift
+
+    def apply_event(self, event):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(event)
+            self._apply(event)
+            self.events_applied += 1
+
+    def _apply(self, event):
+        if event.get('Type', 'container') != 'container':
+            return
+        action = (event.get('Action') or event.get('status') or '').split(':')[0]
+        container_id = event.get('id') or (event.get('Actor') or {}).get('ID')
+        if not container_id:
+            return
+        attributes = (event.get('Actor') or {}).get('Attributes') or {}
+
+        if action == 'destroy':
+            self._containers.discard(container_id)
+            return
+        current = self._containers.get(container_id)
+        if action == 'rename' and current is not None:
+            self._containers.add(Container(current.id, attributes.get('name', current.name), current.state,
+                                           current.image, current.labels))
+            return
+        if action not in EVENT_STATES:
+            return
+        state = EVENT_STATES[action]
+        if current is None:
+            self._containers.add(Container(
+                container_id, attributes.get('name'), state or 'running',
+                attributes.get('image') or event.get('from'),
+            ))
+        elif state is not None and state != current.state:
+            self._containers.add(Container(current.id, current.name, state, current.image, current.labels))
+
+    def get(self, container_id):
+        with self._lock:
+            return self._containers.get(container_id)
+
+    def get_by_name(self, name):
+        with self._lock:
+            return self._containers.get_by_name(name)
+
+    def with_image(self, image):
+        with self._lock:
+            return self._containers.with_image(image)
+
+    def with_state(self, state):
+        with self._lock:
+            return self._containers.with_state(state)
+
+    def containers(self):
+        with self._lock:
+            return list(self._containers)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'containers': len(self._containers),
+                'events_applied': self.events_applied,
+                'resyncs': self.resyncs,
+                'drift_corrections': self.drift_corrections,
+                'last_resync': self.last_resync,
+                'following': self.following,
+                'follow_errors': self.follow_errors,
+                'last_follow_error': self.last_follow_error,
+            }
+
+    def __contains__(self, container_id):
+        with self._lock:
+            return container_id in self._containers
+
+    def __len__(self):
+        with self._lock:
+            return len(self._containers)
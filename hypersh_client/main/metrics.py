@@ -0,0 +1,181 @@
+import re
+import threading
+import time
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIGNING_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+
+# /containers/<id>/start -> /containers/{id}/start, leaving json/create alone
+_ID_SEGMENT = re.compile(r'^(/(?:containers|exec))/(?!json$|create$)[^/]+')
+
+
+def route_name(method, path):
+    """'DELETE', '/containers/abc?v=1' -> 'DELETE /containers/{id}'"""
+    path = path.split('?', 1)[0]
+    return '%s %s' % (method.upper(), _ID_SEGMENT.sub(r'\1/{id}', path))
+
+
+class TimedAuth(object):
+    """Wraps an auth callable to measure how long signing one request takes."""
+
+    __slots__ = ('auth', 'seconds')
+
+    def __init__(self, auth):
+        self.auth = auth
+        self.seconds = 0.0
+
+    def __call__(self, req):
+        started = time.perf_counter()
+        try:
+            return self.auth(req)
+        finally:
+            self.seconds = time.perf_counter() - started
+
+
+class CountingReader(object):
+    """
+    Wraps a streamed response's raw body (Response.raw) to count the bytes
+    read through it, whether by iter_content, read or readinto. urllib3's own
+    tell() misses chunked bodies read through stream().
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def stream(self, *args, **kwargs):
+        for data in self.raw.stream(*args, **kwargs):
+            self.bytes_read += len(data)
+            yield data
+
+    def read(self, *args, **kwargs):
+        data = self.raw.read(*args, **kwargs)
+        self.bytes_read += len(data)
+        return data
+
+    def readinto(self, buf):
+        n = self.raw.readinto(buf)
+        self.bytes_read += n or 0
+        return n
+
+
+class Histogram(object):
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """[(le, count)] including +Inf, as Prometheus expects."""
+        total, result = 0, []
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class MetricsRecorder(object):
+    """
+    Collects per region and route request metrics: latency and signing time
+    histograms, status code counts and bytes sent and received. Pass one to
+    HypershClient(metrics=...); it can be shared between clients and threads.
+
+    Anything with the same observe() signature can be plugged in instead,
+    e.g. to forward to statsd. With metrics=None (the default) the client
+    skips all of this.
+    """
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, signing_buckets=SIGNING_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.signing_buckets = signing_buckets
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, region, route, status, seconds, signing_seconds, bytes_out, bytes_in):
+        """status is the HTTP status code, or None if no response arrived."""
+        key = (region, route)
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = {
+                    'latency': Histogram(self.latency_buckets),
+                    'signing': Histogram(self.signing_buckets),
+                    'statuses': {},
+                    'bytes_out': 0,
+                    'bytes_in': 0,
+                }
+            stats['latency'].observe(seconds)
+            stats['signing'].observe(signing_seconds)
+            status = 'error' if status is None else str(status)
+            stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            stats['bytes_out'] += bytes_out
+            stats['bytes_in'] += bytes_in
+
+    def snapshot(self):
+        """{(region, route): {'count', 'latency_sum', 'signing_sum', 'statuses', 'bytes_out', 'bytes_in'}}"""
+        with self._lock:
+            return dict(
+                (key, {
+                    'count': stats['latency'].count,
+                    'latency_sum': stats['latency'].sum,
+                    'signing_sum': stats['signing'].sum,
+                    'statuses': dict(stats['statuses']),
+                    'bytes_out': stats['bytes_out'],
+                    'bytes_in': stats['bytes_in'],
+                })
+                for key, stats in self._routes.items()
+            )
+
+    def prometheus_text(self, prefix='hypersh'):
+        """Dump everything in the Prometheus text exposition format."""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = []
+
+            def histogram(name, help_text, field):
+                lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+                lines.append('# TYPE %s_%s histogram' % (prefix, name))
+                for (region, route), stats in routes:
+                    labels = 'region="%s",route="%s"' % (region, route)
+                    hist = stats[field]
+                    for bound, count in hist.cumulative():
+                        lines.append('%s_%s_bucket{%s,le="%s"} %d' % (prefix, name, labels, bound, count))
+                    lines.append('%s_%s_sum{%s} %r' % (prefix, name, labels, hist.sum))
+                    lines.append('%s_%s_count{%s} %d' % (prefix, name, labels, hist.count))
+
+            histogram('request_duration_seconds', 'Request latency including signing.', 'latency')
+            histogram('signing_duration_seconds', 'Time spent in AWS4Auth signing a request.', 'signing')
+
+            lines.append('# HELP %s_requests_total Requests by response status.' % prefix)
+            lines.append('# TYPE %s_requests_total counter' % prefix)
+            for (region, route), stats in routes:
+                for status, count in sorted(stats['statuses'].items()):
+                    lines.append('%s_requests_total{region="%s",route="%s",status="%s"} %d' % (
+                        prefix, region, route, status, count))
+
+            lines.append('# HELP %s_bytes_total Request and response body bytes.' % prefix)
+            lines.append('# TYPE %s_bytes_total counter' % prefix)
+            for (region, route), stats in routes:
+                for direction in ('out', 'in'):
+                    lines.append('%s_bytes_total{region="%s",route="%s",direction="%s"} %d' % (
+                        prefix, region, route, direction, stats['bytes_' + direction]))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .hypersh import ENPOINTS, HypershClient
+
+
+class MultiRegionClient(object):
+    """
+    Runs listing and bulk calls against several regions at once. Each region
+    has its own HypershClient, so requests are signed with that region's
+    scope and use that region's connection pool, circuit breaker and clock
+    skew estimate. Merged results carry a 'region' key.
+
+    client_kwargs are passed to every region's client, so circuit_breaker
+    and clock_skew, which hold one endpoint's state, are not accepted.
+    """
+
+    def __init__(self, regions=None, **client_kwargs):
+        for name in ('circuit_breaker', 'clock_skew'):
+            if client_kwargs.get(name) is not None:
+                raise Exception('%s is per region and cannot be shared by MultiRegionClient' % name)
+        regions = regions or sorted(ENPOINTS)
+        self.clients = dict((region, HypershClient(region, **client_kwargs)) for region in regions)
+
+    @property
+    def regions(self):
+        return sorted(self.clients)
+
+    def _fan_out(self, call, failed=(False, None)):
+        # call(client) runs once per region, concurrently; returns {region: result}.
+        # A region whose call raises gets failed instead, the others are unaffected.
+        with ThreadPoolExecutor(max_workers=len(self.clients)) as pool:
+            futures = dict((region, pool.submit(call, client)) for region, client in self.clients.items())
+            results = {}
+            for region, future in futures.items():
+                try:
+                    results[region] = future.result()
+                except Exception as e:
+                    print('warning: request to %s failed: %s: %s' % (region, type(e).__name__, e))
+                    results[region] = failed
+            return results
+
+    def pool_stats(self):
+        return dict((region, client.pool_stats()) for region, client in self.clients.items())
+
+    def get_containers(self, **filters):
+        """
+        Returns (success, containers) like HypershClient.get_containers, with
+        a 'region' key on each container. success is False if any region
+        failed; containers from the regions that succeeded are still returned.
+        as_records isn't supported, Container records have no region field.
+        """
+        if filters.get('as_records'):
+            raise Exception('as_records is not supported by MultiRegionClient.get_containers')
+        results = self._fan_out(lambda client: client.get_containers(**filters))
+        success, containers = True, []
+        for region in self.regions:
+            region_success, region_containers = results[region]
+            if not region_success:
+                print('warning: listing containers failed in ' + region)
+                success = False
+                continue
+            for di in region_containers:
+                di['region'] = region
+                containers.append(di)
+        return success, containers
+
+    def get_fips(self):
+        """Returns (success, [{'region': ..., 'fip': ...}])."""
+        results = self._fan_out(lambda client: client.get_fips())
+        success, fips = True, []
+        for region in self.regions:
+            region_success, region_fips = results[region]
+            if not region_success:
+                print('warning: listing fips failed in ' + region)
+                success = False
+                continue
+            fips.extend({'region': region, 'fip': fip} for fip in region_fips)
+        return success, fips
+
+    def remove_all_containers(self, max_concurrency=10, progress=None, **filters):
+        """
+        Returns {region: (success, aggregate)} as from
+        HypershClient.remove_all_containers. progress also receives the region
+        as its first argument.
+        """
+        def call(client):
+            region_progress = None
+            if progress is not None:
+                region_progress = lambda *args: progress(client.region, *args)
+            return client.remove_all_containers(max_concurrency=max_concurrency, progress=region_progress, **filters)
+        return self._fan_out(call)
+
+    def create_containers(self, specs, max_concurrency=10):
+        """
+        specs are create_container keyword dicts with an extra 'region' key.
+        Regions run concurrently, each with up to max_concurrency specs in
+        flight. Returns result dicts in spec order, tagged with 'region'.
+        """
+        by_region = dict((region, []) for region in self.clients)
+        for index, spec in enumerate(specs):
+            if spec.get('region') not in self.clients:
+                raise Exception('invalid region: %s' % spec.get('region'))
+            by_region[spec['region']].append(index)
+
+        def call(client):
+            indexes = by_region[client.region]
+            region_specs = [dict((k, v) for k, v in specs[i].items() if k != 'region') for i in indexes]
+            return client.create_containers(region_specs, max_concurrency=max_concurrency) if region_specs else []
+
+        results = [None] * len(specs)
+        for region, region_results in self._fan_out(call, failed=None).items():
+            if region_results is None:
+                region_results = [{
+                    'id': None, 'created': False, 'started': False, 'create_time': None,
+                    'start_time': None, 'error': 'region %s failed' % region,
+                } for _ in by_region[region]]
+            for index, result in zip(by_region[region], region_results):
+                result['spec'] = specs[index]
+                result['region'] = region
+                results[index] = result
+        return results
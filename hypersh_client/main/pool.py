@@ -0,0 +1,97 @@
+import threading
+
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class _CountingPoolMixin(object):
+    """
+    Counts what happens to connections in a urllib3 pool: checkouts, socket
+    connects (each one a TCP and TLS handshake, including reconnects of
+    dropped keep-alive connections), returns and connections discarded
+    because the pool was full (the "Connection pool is full" warning).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(_CountingPoolMixin, self).__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.created = 0
+        self.returned = 0
+        self.discarded = 0
+
+    def _new_conn(self):
+        conn = super(_CountingPoolMixin, self)._new_conn()
+        connect = conn.connect
+
+        def counting_connect(*args, **kwargs):
+            with self._stats_lock:
+                self.created += 1
+            return connect(*args, **kwargs)
+
+        conn.connect = counting_connect
+        return conn
+
+    def _get_conn(self, timeout=None):
+        conn = super(_CountingPoolMixin, self)._get_conn(timeout=timeout)
+        with self._stats_lock:
+            self.checkouts += 1
+        return conn
+
+    def _put_conn(self, conn):
+        pool = self.pool
+        with self._stats_lock:
+            self.returned += 1
+            if pool is not None and pool.full():
+                self.discarded += 1
+        super(_CountingPoolMixin, self)._put_conn(conn)
+
+    def stats(self):
+        pool = self.pool
+        idle = sum(1 for conn in list(pool.queue) if conn is not None) if pool is not None else 0
+        with self._stats_lock:
+            return {
+                'in_use': self.checkouts - self.returned,
+                'idle': idle,
+                'created': self.created,
+                'reused': max(0, self.checkouts - self.created),
+                'discarded': self.discarded,
+                'maxsize': pool.maxsize if pool is not None else 0,
+            }
+
+
+class CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools report usage through pool_stats().
+
+    pool_connections -- number of per-host pools to keep
+    pool_maxsize     -- connections kept open per host; size it to the
+                        number of threads sharing the client
+    pool_block       -- wait for a free connection instead of opening (and
+                        later discarding) an extra one once maxsize is in use
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(PooledAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool,
+        }
+
+    def pool_stats(self):
+        """{'scheme://host:port': stats} for every pool currently held."""
+        stats = {}
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if isinstance(pool, _CountingPoolMixin):
+                stats['%s://%s:%s' % (pool.scheme, pool.host, pool.port)] = pool.stats()
+        return stats
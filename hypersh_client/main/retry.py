@@ -0,0 +1,136 @@
+import email.utils
+import random
+import threading
+import time
+
+import requests
+
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without sending anything while an endpoint's circuit is open."""
+
+
+class RetryPolicy(object):
+    """
+    Decides whether and when HypershClient retries a request.
+
+    max_attempts    -- total tries including the first
+    backoff_base    -- first backoff in seconds, doubled each attempt
+    backoff_max     -- cap on a single backoff (and on Retry-After)
+    retry_statuses  -- statuses worth retrying for idempotent methods
+    retry_non_idempotent
+                    -- also retry POSTs on those statuses and on read
+                       errors. Off by default, since the server may have
+                       acted on a request whose response was lost (a
+                       create retried this way can create twice).
+
+    POSTs are always retried on 429, and on connect timeouts, because the
+    server did not act on them. Backoff uses full jitter, a random delay
+    between 0 and the exponential cap, so many clients throttled at once
+    don't retry in lockstep. A Retry-After header replaces the computed
+    delay.
+    """
+
+    def __init__(self, max_attempts=4, backoff_base=0.5, backoff_max=30.0,
+                 retry_statuses=(429, 500, 502, 503, 504), retry_non_idempotent=False,
+                 sleep=time.sleep, rand=random.random):
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_non_idempotent = retry_non_idempotent
+        self.sleep = sleep
+        self.random = rand
+
+    def should_retry(self, method, attempt, response=None, exc=None):
+        """attempt is the number of tries made so far."""
+        if attempt >= self.max_attempts:
+            return False
+        idempotent = method.upper() in IDEMPOTENT_METHODS or self.retry_non_idempotent
+        if exc is not None:
+            return idempotent or isinstance(exc, requests.exceptions.ConnectTimeout)
+        if response.status_code == 429:
+            return True
+        return idempotent and response.status_code in self.retry_statuses
+
+    def delay(self, attempt, response=None):
+        retry_after = self.retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        cap = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return cap * self.random()
+
+    @staticmethod
+    def retry_after(response):
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        parsed = email.utils.parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, email.utils.mktime_tz(parsed) - time.time())
+
+
+class CircuitBreaker(object):
+    """
+    Fails fast after failure_threshold consecutive failures (connection
+    errors, 429 and 5xx) until reset_timeout seconds pass. Then it lets one
+    trial request through: success closes the circuit, failure reopens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.time):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release(self):
+        """
+        Hands back a trial that ended without reaching the endpoint (bad
+        credentials, an unserialisable body, an interrupt), so the next
+        request can make the trial instead.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+                self._trial_in_flight = False
+
+
+def is_failure(response):
+    return response.status_code == 429 or response.status_code >= 500
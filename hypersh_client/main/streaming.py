@@ -0,0 +1,181 @@
+import codecs
+import json
+import struct
+
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',]'
+
+STDIN, STDOUT, STDERR = 0, 1, 2
+_FRAME_HEADER = struct.Struct('>BxxxI')
+
+
+def iter_json_array(chunks, encoding='utf-8'):
+    """
+    Yield the elements of a top level JSON array as they become complete,
+    reading from an iterable of byte chunks (e.g. Response.iter_content).
+    Only the element being decoded is held in memory, never the whole body.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding)()
+    chunks = iter(chunks)
+    buf = ''
+    pos = 0
+    started = False
+    # True between an element and the ',' or ']' that must follow it
+    after_element = False
+    first = True
+    exhausted = False
+
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos < len(buf):
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError('expected a JSON array, got %r' % buf[pos:pos + 20])
+                started = True
+                pos += 1
+                continue
+            if after_element:
+                if buf[pos] == ']':
+                    return
+                if buf[pos] != ',':
+                    raise ValueError('expected , or ] in JSON array, got %r' % buf[pos:pos + 20])
+                after_element = False
+                pos += 1
+                continue
+            if buf[pos] == ']' and first:
+                return
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                # element incomplete, wait for more input below
+                if exhausted:
+                    raise
+            else:
+                # a number cut at the buffer edge ('4.' of '4.5') decodes
+                # early, so only trust an element followed by a delimiter
+                if end < len(buf) and buf[end] in _DELIMITERS:
+                    yield obj
+                    pos = end
+                    after_element, first = True, False
+                    continue
+                if exhausted:
+                    if end == len(buf):
+                        yield obj
+                        pos = end
+                        after_element, first = True, False
+                        continue
+                    raise ValueError('unexpected %r after array element' % buf[end:end + 20])
+        if exhausted:
+            raise ValueError('truncated JSON array')
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            buf = buf[pos:] + text_decoder.decode(b'', final=True)
+            pos = 0
+            exhausted = True
+            continue
+        buf = buf[pos:] + text_decoder.decode(chunk)
+        pos = 0
+
+
+def iter_ndjson(chunks):
+    """
+    Yield one decoded object per line of newline-delimited JSON read from an
+    iterable of byte chunks, as soon as each line is complete. Blank lines
+    are skipped; a trailing line without a newline is decoded at the end.
+    """
+    buf = bytearray()
+    for chunk in chunks:
+        buf.extend(chunk)
+        start = 0
+        while True:
+            end = buf.find(b'\n', start)
+            if end == -1:
+                break
+            line = bytes(buf[start:end]).strip()
+            start = end + 1
+            if line:
+                yield json.loads(line.decode('utf-8'))
+        del buf[:start]
+    line = bytes(buf).strip()
+    if line:
+        yield json.loads(line.decode('utf-8'))
+
+
+def _read_exactly(raw, view):
+    """Fill view from raw. False on a clean EOF before the first byte."""
+    filled = 0
+    while filled < len(view):
+        n = raw.readinto(view[filled:])
+        if not n:
+            if filled == 0:
+                return False
+            raise ValueError('stream ended inside a frame header')
+        filled += n
+    return True
+
+
+def iter_frames(raw, buffer_size=64 * 1024, tty=None):
+    """
+    Demultiplex a Docker attach/logs stream read from raw (anything with
+    readinto, e.g. Response.raw), yielding (stream, data) with stream one of
+    STDIN, STDOUT, STDERR.
+
+    Each frame is an 8-byte header (stream, 3 zero bytes, big endian payload
+    length) followed by the payload. Headers and payloads are read with
+    readinto into two buffers allocated once, and data is a memoryview
+    slice of the payload buffer: nothing is copied or concatenated, and
+    memory stays at buffer_size however large a frame is (bigger frames
+    come out in several pieces). data is only valid until the next
+    iteration; copy it (bytes(data)) to keep it.
+
+    tty=True means the container has a TTY and the stream is raw, unframed
+    output (all reported as STDOUT). tty=None decides from the first header.
+    """
+    header = bytearray(_FRAME_HEADER.size)
+    header_view = memoryview(header)
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+
+    if tty is None:
+        filled = 0
+        while filled < len(header):
+            n = raw.readinto(header_view[filled:])
+            if not n:
+                break
+            filled += n
+        if not filled:
+            return
+        if filled == len(header) and header[0] <= STDERR and header[1:4] == b'\0\0\0':
+            stream, length = _FRAME_HEADER.unpack(header)
+            for data in _iter_payload(raw, view, length):
+                yield stream, data
+        else:
+            tty = True
+            yield STDOUT, header_view[:filled]
+            if filled < len(header):
+                return
+
+    if tty:
+        while True:
+            n = raw.readinto(view)
+            if not n:
+                return
+            yield STDOUT, view[:n]
+
+    while _read_exactly(raw, header_view):
+        stream, length = _FRAME_HEADER.unpack(header)
+        for data in _iter_payload(raw, view, length):
+            yield stream, data
+
+
+def _iter_payload(raw, view, length):
+    while length:
+        n = raw.readinto(view[:min(length, len(view))])
+        if not n:
+            raise ValueError('stream ended inside a frame, %d bytes missing' % length)
+        length -= n
+        yield view[:n]
@@ -1,4 +1,3 @@
-import time
 from uuid import uuid4
 
 from main.hypersh2 import HypershClient
@@ -11,6 +10,6 @@ if __name__ == '__main__':
     success, fips = client.get_fips()
     name = 'seleniumnode' + uuid4().hex[:7]
     success, container_id = client.create_container('digiology/selenium_node', name=name)
-    time.sleep(6)
+    client.wait_for_state([container_id], 'running', timeout=60)
     success, containers = client.get_containers()
     assert (name in [c['name'] for c in containers]) is True
@@ -0,0 +1,149 @@
+import json
+import struct
+
+import pytest
+import requests
+
+from hypersh_client.conftest import StandInHandler
+from hypersh_client.main.hypersh import HypershClient
+from hypersh_client.main.metrics import MetricsRecorder, route_name
+from hypersh_client.main.retry import RetryPolicy
+
+
+def test_route_name_collapses_ids_and_drops_the_query():
+    assert route_name('delete', '/containers/4f2a9c?v=1&force=1') == 'DELETE /containers/{id}'
+    assert route_name('POST', '/containers/4f2a9c/start') == 'POST /containers/{id}/start'
+    assert route_name('GET', '/exec/e1/json') == 'GET /exec/{id}/json'
+    assert route_name('GET', '/containers/json?all=1') == 'GET /containers/json'
+    assert route_name('POST', '/containers/create?name=hub') == 'POST /containers/create'
+    assert route_name('GET', '/fips') == 'GET /fips'
+    assert route_name('POST', '/fips/attach?ip=1.2.3.4&container=c1') == 'POST /fips/attach'
+
+
+def test_prometheus_text_format():
+    metrics = MetricsRecorder(latency_buckets=(0.1, 1.0), signing_buckets=(0.001,))
+    metrics.observe('us-west-1', 'GET /fips', 200, 0.05, 0.0005, 0, 120)
+    metrics.observe('us-west-1', 'GET /fips', None, 2.0, 0.002, 0, 0)
+
+    assert metrics.prometheus_text().splitlines() == [
+        '# HELP hypersh_request_duration_seconds Request latency including signing.',
+        '# TYPE hypersh_request_duration_seconds histogram',
+        'hypersh_request_duration_seconds_bucket{region="us-west-1",route="GET /fips",le="0.1"} 1',
+        'hypersh_request_duration_seconds_bucket{region="us-west-1",route="GET /fips",le="1.0"} 1',
+        'hypersh_request_duration_seconds_bucket{region="us-west-1",route="GET /fips",le="+Inf"} 2',
+        'hypersh_request_duration_seconds_sum{region="us-west-1",route="GET /fips"} 2.05',
+        'hypersh_request_duration_seconds_count{region="us-west-1",route="GET /fips"} 2',
+        '# HELP hypersh_signing_duration_seconds Time spent in AWS4Auth signing a request.',
+        '# TYPE hypersh_signing_duration_seconds histogram',
+        'hypersh_signing_duration_seconds_bucket{region="us-west-1",route="GET /fips",le="0.001"} 1',
+        'hypersh_signing_duration_seconds_bucket{region="us-west-1",route="GET /fips",le="+Inf"} 2',
+        'hypersh_signing_duration_seconds_sum{region="us-west-1",route="GET /fips"} 0.0025',
+        'hypersh_signing_duration_seconds_count{region="us-west-1",route="GET /fips"} 2',
+        '# HELP hypersh_requests_total Requests by response status.',
+        '# TYPE hypersh_requests_total counter',
+        'hypersh_requests_total{region="us-west-1",route="GET /fips",status="200"} 1',
+        'hypersh_requests_total{region="us-west-1",route="GET /fips",status="error"} 1',
+        '# HELP hypersh_bytes_total Request and response body bytes.',
+        '# TYPE hypersh_bytes_total counter',
+        'hypersh_bytes_total{region="us-west-1",route="GET /fips",direction="out"} 0',
+        'hypersh_bytes_total{region="us-west-1",route="GET /fips",direction="in"} 120',
+    ]
+    assert metrics.snapshot()[('us-west-1', 'GET /fips')]['statuses'] == {'200': 1, 'error': 1}
+
+
+LISTING = json.dumps([{'Id': 'c%d' % i, 'Names': ['/node-%d' % i], 'State': 'running', 'Image': 'selenium/node'}
+                      for i in range(20)]).encode()
+LOGS = b''.join(struct.pack('>BxxxL', stream, len(line)) + line
+                for stream, line in [(1, b'started\n'), (2, b'warning\n'), (1, b'x' * 300)])
+
+
+class ApiHandler(StandInHandler):
+    """Sends the listing and logs chunked, without a Content-Length."""
+
+    def send_chunked(self, content_type, data):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i in range(0, len(data), 50):
+            piece = data[i:i + 50]
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(piece), piece))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def do_GET(self):
+        if self.path.startswith('/v1.23/containers/json'):
+            self.send_chunked('application/json', LISTING)
+        elif self.path.startswith('/v1.23/containers/c1/logs'):
+            self.send_chunked('application/vnd.docker.multiplexed-stream', LOGS)
+        else:
+            self.send_json(200, [{'fip': '1.2.3.4'}])
+
+    def do_POST(self):
+        self.server.bodies.append(self.rfile.read(int(self.headers['Content-Length'] or 0)))
+        if self.path.startswith('/v1.23/containers/create'):
+            self.send_json(201, {'Id': 'c9'})
+        else:
+            self.send_json(204)
+
+
+@pytest.fixture
+def client(stand_in_server):
+    server = stand_in_server(ApiHandler, bodies=[])
+    client = HypershClient('us-west-1', access_key='access', secret='secret', metrics=MetricsRecorder())
+    client.hyper_endpoint = server.endpoint
+    client.server = server
+    return client
+
+
+def test_client_observes_routes_statuses_and_bytes(client):
+    assert client.get_fips() == (True, ['1.2.3.4'])
+    assert client.create_container('selenium/node', name='node-9') == (True, 'c9')
+
+    snapshot = client.metrics.snapshot()
+    assert sorted(snapshot) == [('us-west-1', 'GET /fips'), ('us-west-1', 'POST /containers/create'),
+                                ('us-west-1', 'POST /containers/{id}/start')]
+    fips = snapshot[('us-west-1', 'GET /fips')]
+    assert (fips['count'], fips['statuses'], fips['bytes_out'], fips['bytes_in']) == (1, {'200': 1}, 0, len(json.dumps([{'fip': '1.2.3.4'}])))
+    create = snapshot[('us-west-1', 'POST /containers/create')]
+    assert create['statuses'] == {'201': 1}
+    assert create['bytes_out'] == len(client.server.bodies[0]) > 0
+    assert create['bytes_in'] == len(b'{"Id": "c9"}')
+    assert snapshot[('us-west-1', 'POST /containers/{id}/start')]['statuses'] == {'204': 1}
+    # TimedAuth timed the signer for every request
+    assert all(route['signing_sum'] > 0 and route['latency_sum'] >= route['signing_sum']
+               for route in snapshot.values())
+
+
+def test_streamed_responses_count_the_bytes_read(client):
+    assert len(list(client.iter_containers())) == 20
+    assert [(stream, bytes(data)) for stream, data in client.stream_logs('c1', follow=False)][:2] == [
+        (1, b'started\n'), (2, b'warning\n')]
+
+    snapshot = client.metrics.snapshot()
+    listing = snapshot[('us-west-1', 'GET /containers/json')]
+    assert (listing['count'], listing['statuses'], listing['bytes_in']) == (1, {'200': 1}, len(LISTING))
+    logs = snapshot[('us-west-1', 'GET /containers/{id}/logs')]
+    assert (logs['count'], logs['statuses'], logs['bytes_in']) == (1, {'200': 1}, len(LOGS))
+    assert logs['signing_sum'] > 0
+
+
+def test_abandoned_stream_counts_what_was_read(client):
+    listing = client.iter_containers(chunk_size=100)
+    assert next(listing)['id'] == 'c0'
+    assert client.metrics.snapshot() == {}
+    listing.close()
+
+    bytes_in = client.metrics.snapshot()[('us-west-1', 'GET /containers/json')]['bytes_in']
+    assert 0 < bytes_in < len(LISTING)
+
+
+def test_failed_request_is_observed_as_an_error(client):
+    client.server.shutdown()
+    client.server.server_close()
+    client.retry_policy = RetryPolicy(max_attempts=1)
+    with pytest.raises(requests.ConnectionError):
+        client.get_fips()
+
+    fips = client.metrics.snapshot()[('us-west-1', 'GET /fips')]
+    assert (fips['count'], fips['statuses'], fips['bytes_in']) == (1, {'error': 1}, 0)
+    assert fips['signing_sum'] > 0
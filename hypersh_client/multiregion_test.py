@@ -0,0 +1,80 @@
+import pytest
+import requests
+
+from hypersh_client.main.clockskew import ClockSkew
+from hypersh_client.main.multiregion import MultiRegionClient
+from hypersh_client.main.retry import CircuitBreaker
+
+
+class StubClient(object):
+
+    def __init__(self, region, containers=(), fips=(), error=None):
+        self.region = region
+        self.containers = containers
+        self.fips = fips
+        self.error = error
+
+    def get_containers(self, **filters):
+        if self.error is not None:
+            raise self.error
+        return True, [dict(di) for di in self.containers]
+
+    def get_fips(self):
+        if self.error is not None:
+            raise self.error
+        return True, list(self.fips)
+
+    def create_containers(self, specs, max_concurrency=10):
+        if self.error is not None:
+            raise self.error
+        return [{'id': spec['name'], 'created': True, 'started': True, 'error': None} for spec in specs]
+
+
+def _multi(*stubs):
+    multi = MultiRegionClient(regions=[stub.region for stub in stubs], access_key='access', secret='secret')
+    multi.clients = dict((stub.region, stub) for stub in stubs)
+    return multi
+
+
+def test_each_region_gets_its_own_breaker_and_clock_skew():
+    multi = MultiRegionClient(access_key='access', secret='secret')
+    west, central = multi.clients['us-west-1'], multi.clients['eu-central-1']
+    assert west.circuit_breaker is not central.circuit_breaker
+    assert west.clock_skew is not central.clock_skew
+    assert west.hyper_auth.region == 'us-west-1'
+
+    with pytest.raises(Exception):
+        MultiRegionClient(access_key='access', secret='secret', circuit_breaker=CircuitBreaker())
+    with pytest.raises(Exception):
+        MultiRegionClient(access_key='access', secret='secret', clock_skew=ClockSkew())
+
+
+def test_listings_are_merged_and_tagged_with_the_region():
+    multi = _multi(
+        StubClient('us-west-1', containers=[{'Id': 'c1'}], fips=['1.1.1.1']),
+        StubClient('eu-central-1', containers=[{'Id': 'c2'}, {'Id': 'c3'}], fips=['2.2.2.2']),
+    )
+    success, containers = multi.get_containers()
+    assert success
+    assert [(di['region'], di['Id']) for di in containers] == [
+        ('eu-central-1', 'c2'), ('eu-central-1', 'c3'), ('us-west-1', 'c1')]
+    assert multi.get_fips() == (True, [
+        {'region': 'eu-central-1', 'fip': '2.2.2.2'}, {'region': 'us-west-1', 'fip': '1.1.1.1'}])
+
+    with pytest.raises(Exception):
+        multi.get_containers(as_records=True)
+
+
+def test_a_failing_region_does_not_abort_the_others():
+    multi = _multi(
+        StubClient('us-west-1', containers=[{'Id': 'c1'}], fips=['1.1.1.1']),
+        StubClient('eu-central-1', error=requests.exceptions.ConnectionError('unreachable')),
+    )
+    assert multi.get_containers() == (False, [{'Id': 'c1', 'region': 'us-west-1'}])
+    assert multi.get_fips() == (False, [{'region': 'us-west-1', 'fip': '1.1.1.1'}])
+
+    specs = [{'region': 'eu-central-1', 'name': 'a'}, {'region': 'us-west-1', 'name': 'b'}]
+    results = multi.create_containers(specs)
+    assert [(r['region'], r['created'], r['spec']) for r in results] == [
+        ('eu-central-1', False, specs[0]), ('us-west-1', True, specs[1])]
+    assert results[0]['error']
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from hypersh_client.conftest import StandInHandler
+from hypersh_client.main.hypersh import HypershClient
+
+
+class FipsHandler(StandInHandler):
+    """Holds every request until server.gate is set, counting arrivals."""
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.arrived += 1
+        self.server.gate.wait(5)
+        data = b'[{"fip": "1.2.3.4"}]'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        if self.headers.get('Connection', '').lower() == 'close':
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def server(stand_in_server):
+    return stand_in_server(FipsHandler, lock=threading.Lock(), arrived=0, gate=threading.Event())
+
+
+def _client(server, **kwargs):
+    client = HypershClient('us-west-1', access_key='access', secret='secret', **kwargs)
+    client.hyper_endpoint = server.endpoint
+    return client
+
+
+def _stats(client):
+    stats = client.pool_stats()
+    assert len(stats) == 1
+    return list(stats.values())[0]
+
+
+def _wait_for_arrivals(server, count):
+    deadline = time.time() + 5
+    while server.arrived < count:
+        assert time.time() < deadline, 'only %s of %s requests arrived' % (server.arrived, count)
+        time.sleep(0.001)
+
+
+def _get_fips_concurrently(client, threads):
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(client.get_fips())) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    return workers, results
+
+
+def test_keep_alive_reuses_one_connection(server):
+    server.gate.set()
+    client = _client(server)
+    for _ in range(5):
+        assert client.get_fips() == (True, ['1.2.3.4'])
+
+    stats = _stats(client)
+    assert (stats['created'], stats['reused'], stats['discarded']) == (1, 4, 0)
+    assert (stats['in_use'], stats['idle'], stats['maxsize']) == (0, 1, 10)
+
+
+def test_without_keep_alive_every_request_connects(server):
+    server.gate.set()
+    client = _client(server, keep_alive=False)
+    for _ in range(5):
+        assert client.get_fips() == (True, ['1.2.3.4'])
+
+    stats = _stats(client)
+    assert (stats['created'], stats['reused'], stats['discarded']) == (5, 0, 0)
+    assert stats['in_use'] == 0
+
+
+def test_threads_beyond_maxsize_open_connections_that_are_discarded(server):
+    client = _client(server, pool_maxsize=2)
+    workers, results = _get_fips_concurrently(client, 5)
+    _wait_for_arrivals(server, 5)
+    server.gate.set()
+    for thread in workers:
+        thread.join(5)
+
+    assert results == [(True, ['1.2.3.4'])] * 5
+    stats = _stats(client)
+    assert (stats['created'], stats['reused'], stats['discarded']) == (5, 0, 3)
+    assert (stats['in_use'], stats['idle'], stats['maxsize']) == (0, 2, 2)
+
+
+def test_pool_block_waits_for_a_free_connection(server):
+    client = _client(server, pool_maxsize=2, pool_block=True)
+    workers, results = _get_fips_concurrently(client, 5)
+    _wait_for_arrivals(server, 2)
+    time.sleep(0.2)
+    # the other three threads are waiting on the pool, not connecting
+    assert server.arrived == 2
+    assert _stats(client)['in_use'] == 2
+    server.gate.set()
+    for thread in workers:
+        thread.join(5)
+
+    assert results == [(True, ['1.2.3.4'])] * 5
+    stats = _stats(client)
+    assert (stats['created'], stats['reused'], stats['discarded']) == (2, 3, 0)
+    assert (stats['in_use'], stats['idle'], stats['maxsize']) == (0, 2, 2)
@@ -0,0 +1,150 @@
+import email.utils
+import time
+
+import pytest
+import requests
+
+from hypersh_client.conftest import StandInHandler
+from hypersh_client.main.hypersh import HypershClient
+from hypersh_client.main.retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+def _response(status, **headers):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers)
+    return resp
+
+
+def test_posts_are_only_retried_when_the_server_did_not_act():
+    policy = RetryPolicy()
+    assert policy.should_retry('GET', 1, response=_response(503))
+    assert policy.should_retry('delete', 1, exc=requests.exceptions.ReadTimeout())
+    assert not policy.should_retry('POST', 1, response=_response(503))
+    assert not policy.should_retry('POST', 1, exc=requests.exceptions.ReadTimeout())
+    assert policy.should_retry('POST', 1, response=_response(429))
+    assert policy.should_retry('POST', 1, exc=requests.exceptions.ConnectTimeout())
+    assert not policy.should_retry('GET', 1, response=_response(404))
+    assert not policy.should_retry('GET', 4, response=_response(503))
+
+    assert RetryPolicy(retry_non_idempotent=True).should_retry('POST', 1, response=_response(503))
+
+
+def test_backoff_is_jittered_exponential_and_capped():
+    policy = RetryPolicy(backoff_base=0.5, backoff_max=3.0, rand=lambda: 0.5)
+    assert [policy.delay(attempt) for attempt in (1, 2, 3, 4, 5)] == [0.25, 0.5, 1.0, 1.5, 1.5]
+
+
+def test_retry_after_in_seconds_and_as_a_date():
+    policy = RetryPolicy(backoff_max=30.0, rand=lambda: 0.0)
+    assert policy.delay(1, _response(429, **{'Retry-After': '7'})) == 7.0
+    assert policy.delay(1, _response(429, **{'Retry-After': '600'})) == 30.0
+
+    later = email.utils.formatdate(time.time() + 120, usegmt=True)
+    assert policy.delay(1, _response(503, **{'Retry-After': later})) == 30.0
+    soon = email.utils.formatdate(time.time() + 10, usegmt=True)
+    assert 8.0 <= policy.delay(1, _response(503, **{'Retry-After': soon})) <= 10.0
+    earlier = email.utils.formatdate(time.time() - 60, usegmt=True)
+    assert policy.delay(1, _response(503, **{'Retry-After': earlier})) == 0.0
+
+    # unparseable values fall back to the computed backoff
+    assert policy.delay(1, _response(503, **{'Retry-After': 'soon'})) == 0.0
+
+
+def test_circuit_opens_half_opens_and_closes():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # one trial at a time
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+class FlakyHandler(StandInHandler):
+
+    def do_GET(self):
+        status, headers = self.server.replies.pop(0) if self.server.replies else (200, {})
+        self.server.count += 1
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'[]')
+
+    do_POST = do_GET
+
+
+def _client(server, sleeps, breaker=None):
+    client = HypershClient(
+        'us-west-1', access_key='access', secret='secret',
+        retry_policy=RetryPolicy(sleep=sleeps.append, rand=lambda: 1.0), circuit_breaker=breaker,
+    )
+    client.hyper_endpoint = server.endpoint
+    return client
+
+
+def test_request_retries_with_retry_after_then_succeeds(stand_in_server):
+    server = stand_in_server(FlakyHandler, count=0, replies=[(503, {'Retry-After': '2'}), (502, {})])
+    sleeps = []
+    resp = _client(server, sleeps)._request('GET', '/fips')
+    assert resp.status_code == 200
+    assert server.count == 3
+    assert sleeps == [2.0, 1.0]
+
+
+def test_post_is_not_retried_on_server_error(stand_in_server):
+    server = stand_in_server(FlakyHandler, count=0, replies=[(503, {})])
+    sleeps = []
+    resp = _client(server, sleeps)._request('POST', '/containers/create', json={})
+    assert resp.status_code == 503
+    assert server.count == 1
+    assert sleeps == []
+
+
+def test_failures_open_the_circuit_and_a_trial_closes_it(stand_in_server):
+    server = stand_in_server(FlakyHandler, count=0, replies=[(500, {})] * 4)
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=4, reset_timeout=30.0, clock=lambda: now[0])
+    client = _client(server, [], breaker)
+
+    assert client._request('GET', '/fips').status_code == 500
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        client._request('GET', '/fips')
+    assert server.count == 4
+
+    now[0] = 30.0
+    assert client._request('GET', '/fips').status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_trial_is_released_when_the_request_never_reaches_the_endpoint():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 30.0
+    client = HypershClient('us-west-1', access_key='access', secret='secret', circuit_breaker=breaker)
+
+    # the body can't be serialised, so nothing is sent
+    with pytest.raises(TypeError):
+        client._request('POST', '/containers/create', json=object())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from hypersh_client.main.hypersh import HypershClient
+from hypersh_client.main.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    ran = []
+
+    def fetch():
+        ran.append(1)
+        release.wait(5)
+        return ['c1']
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('key', fetch)))
+    leader.start()
+    while flight.stats()['in_flight'] == 0:
+        time.sleep(0.001)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('key', fetch))) for _ in range(7)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()['calls'] < 8:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert results == [['c1']] * 8
+    assert len(ran) == 1
+    assert flight.stats() == {'calls': 8, 'executions': 1, 'coalesced': 7, 'in_flight': 0}
+
+    # nothing is cached once the flight lands
+    assert flight.do('key', fetch) == ['c1']
+    assert flight.stats()['executions'] == 2
+
+
+def test_exception_reaches_every_caller():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError('listing failed')
+
+    errors = []
+
+    def call():
+        try:
+            flight.do('key', fail)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()['calls'] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == ['listing failed'] * 4
+    assert flight.stats()['executions'] == 1
+    with pytest.raises(ValueError):
+        flight.do('key', fail)
+
+
+def test_client_coalesces_only_when_asked():
+    assert HypershClient('us-west-1', access_key='access', secret='secret').coalescing_stats() is None
+    client = HypershClient('us-west-1', coalesce=True, access_key='access', secret='secret')
+    assert client.coalescing_stats()['calls'] == 0
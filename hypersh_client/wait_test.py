@@ -0,0 +1,79 @@
+import json
+import time
+
+import pytest
+
+from hypersh_client.conftest import StandInHandler
+from hypersh_client.main.hypersh import HypershClient
+
+try:
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from urlparse import parse_qs, urlparse
+
+
+HUB = 'a' * 64
+NODE = 'b' * 64
+
+
+class ListingHandler(StandInHandler):
+    """Containers start running once the listing has been polled server.running_after[id] times."""
+
+    def do_GET(self):
+        filters = json.loads(parse_qs(urlparse(self.path).query)['filters'][0])
+        self.server.polls.append(filters['id'])
+        polls = len(self.server.polls)
+        records = [
+            {'Id': full_id, 'Names': [], 'Image': 'selenium/node',
+             'State': 'running' if polls >= running_after else 'created'}
+            for full_id, running_after in sorted(self.server.running_after.items())
+            # like Docker, the id filter matches prefixes
+            if any(full_id.startswith(prefix) for prefix in filters['id'])
+        ]
+        self.send_json(200, records)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    sleep = time.sleep
+
+    def recording_sleep(seconds):
+        recorded.append(round(seconds, 6))
+        sleep(seconds)
+
+    monkeypatch.setattr(time, 'sleep', recording_sleep)
+    return recorded
+
+
+def _client(stand_in_server, running_after):
+    server = stand_in_server(ListingHandler, polls=[], running_after=running_after)
+    client = HypershClient('us-west-1', access_key='access', secret='secret')
+    client.hyper_endpoint = server.endpoint
+    return client, server
+
+
+def test_polls_only_pending_ids_and_backs_off_without_progress(stand_in_server, sleeps):
+    client, server = _client(stand_in_server, {HUB: 1, NODE: 4})
+    success, states = client.wait_for_state([HUB, 'bbbb'], timeout=10, min_interval=0.01, max_interval=0.02)
+
+    assert success
+    # short ids are reported under the id the caller gave
+    assert states == {HUB: 'running', 'bbbb': 'running'}
+    assert server.polls == [[HUB, 'bbbb'], ['bbbb'], ['bbbb'], ['bbbb']]
+    # back to min_interval after progress, then half again per idle poll, capped
+    assert sleeps == [0.01, 0.015, 0.02]
+
+
+def test_times_out_with_the_last_states_seen(stand_in_server, sleeps):
+    client, server = _client(stand_in_server, {HUB: 1, NODE: 10 ** 6})
+    started = time.time()
+    success, states = client.wait_for_state([HUB, NODE, 'c' * 64], timeout=0.5, min_interval=0.05, max_interval=0.1)
+
+    assert not success
+    assert states == {HUB: 'running', NODE: 'created', 'c' * 64: None}
+    assert 0.5 <= time.time() - started < 2
+    assert sleeps[:3] == [0.05, 0.075, 0.1]
+    # the last sleep is cut short at the deadline
+    assert max(sleeps) <= 0.1
+    assert all(ids == sorted([NODE, 'c' * 64]) for ids in server.polls[1:])
@@ -7,11 +7,16 @@ INSTALL_REQUIREMENTS = [
     'requests',
 ]
 
+EXTRAS_REQUIRE = {
+    'async': ['aiohttp'],
+}
+
 setup(
     name = "hypersh-client",
     version = "0.0.12",
     author = "Ross Rochford",
     packages=['hypersh_client'],
     install_requires=INSTALL_REQUIREMENTS,    
+    extras_require=EXTRAS_REQUIRE,
     classifiers=[],
 )